@@ -17,24 +17,98 @@ import os
 import sys
 import re
 import requests
+from requests.adapters import HTTPAdapter, Retry
 import json
+import gzip
 import socket
 import time
 import uuid
+import queue
+import threading
 import hashlib
+from collections import OrderedDict
+from functools import lru_cache
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Iterator, Callable
 
 # Add parent directory to path for imports
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 from core.models import LogEvent
 
+# Optional: orjson serializes payloads several times faster than stdlib json
+try:
+    import orjson
+    HAVE_ORJSON = True
+except ImportError:
+    HAVE_ORJSON = False
+    # Fallback: stdlib json
+
+# Optional: Hyperscan/Vectorscan pre-classifies lines in a single SIMD pass
+try:
+    import hyperscan
+    HAVE_HYPERSCAN = True
+except ImportError:
+    HAVE_HYPERSCAN = False
+    # Fallback: one compiled re alternation gates candidate lines
+
+
+@lru_cache(maxsize=4096)
+def _parse_ts_cached(ts_str: str, is_iso: bool, year: int) -> str:
+    """
+    Convert an extracted timestamp string to a UTC ISO string.
+    Cached because consecutive log lines usually share the same second.
+    """
+    if is_iso:
+        dt = datetime.fromisoformat(ts_str)
+    else:
+        # Syslog format (no year in the line)
+        dt = datetime.strptime(f"{year} {ts_str}", "%Y %b %d %H:%M:%S")
+    return dt.replace(tzinfo=timezone.utc).isoformat()
+
 
 class FirewallAgent:
     """Collects firewall logs and events."""
     
+    # Patterns used on every line, compiled once. re.ASCII keeps \d to [0-9];
+    # the IPv4 lookarounds reject addresses embedded in longer digit/dot runs
+    IPV4_RE = re.compile(r"(?<!\d)(?<!\d\.)(\d{1,3}(?:\.\d{1,3}){3})(?!\.?\d)", re.ASCII)
+    TS_ISO_RE = re.compile(r"(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2})", re.ASCII)
+    TS_SYSLOG_RE = re.compile(r"(\w{3}\s+\d{1,2}\s+\d{2}:\d{2}:\d{2})", re.ASCII)
+    
+    # Request bodies larger than this are gzip-compressed before sending
+    GZIP_MIN_BYTES = 4096
+    
+    # Read-ahead buffer for tailing the log; large appends are pulled in few read() syscalls
+    READ_BUFFER_SIZE = 1 << 20
+    
+    # Event batches waiting for the sender thread; a full queue blocks the reader
+    SEND_QUEUE_SIZE = 8
+    
+    # Number of recent line hashes remembered for deduplication
+    MAX_PROCESSED_LINES = 100000
+    
+    # Threat category -> (event_id tag, event_type, severity)
+    THREAT_EVENTS = {
+        "scan": ("fw-scan", "PORT_SCAN", 4),
+        "intrusion": ("fw-intrusion", "CRITICAL_ERROR", 5),
+    }
+    
+    # Column order of the event rows produced by parse_event
+    EVENT_FIELDS = ("event_id", "timestamp", "source_host", "os_type", "event_type",
+                    "severity", "source_ip", "user", "raw_message")
+    
+    # Leading keywords of the generic_block pattern
+    GENERIC_BLOCK_WORDS = ("blocked", "denied", "dropped")
+    
+    # Firewalls whose logs are netfilter KEY=VAL lines vs. free-form block messages
+    NETFILTER_TYPES = ("iptables", "ufw")
+    GENERIC_BLOCK_TYPES = ("pfsense", "opnsense", "cisco", "fortinet")
+    
+    # Fields an iptables/UFW line must carry to be reported as a block
+    NETFILTER_KEYS = ("IN", "SRC", "DST", "PROTO", "SPT", "DPT")
+    
     def __init__(self, api_url: str = "http://localhost:8000", api_key: str = "default-insecure-key-change-me"):
         self.api_url = api_url
         self.api_key = api_key
@@ -42,14 +116,37 @@ class FirewallAgent:
         self.os_type = "FIREWALL"
         self.firewall_type = os.getenv("FIREWALL_TYPE", "generic")  # generic, iptables, pfense, etc.
         
+        # Persistent HTTP session so flushes reuse pooled keep-alive connections
+        self.session = requests.Session()
+        self.session.headers.update({"api-key": api_key})
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=4, max_retries=Retry(total=3, backoff_factor=0.5))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        
         # Log file path - varies by firewall
         self.log_file = self._get_log_file()
         
         self.last_position = 0
-        self.processed_lines = set()
+        self.last_inode = None
+        self.processed_lines = OrderedDict()  # Bounded LRU of recent line hashes
         
         # Firewall-specific regex patterns
         self.patterns = self._get_firewall_patterns()
+        
+        # Cheap substring gates checked before running the matching regexes.
+        # Each tuple holds literals that must appear for its pattern to match.
+        self._block_keywords = ("drop", "block", "denied")
+        self._threat_keywords = ("scan", "flood", "ddos", "intrusion", "attack", "malicious", "threat")
+        
+        # All gate keywords compiled into one Hyperscan database when available,
+        # otherwise into a single alternation so the batch filter stays one C-level scan per line
+        gate_keywords = self._block_keywords + self._threat_keywords
+        self._gate_re = re.compile("|".join(re.escape(k) for k in gate_keywords), re.IGNORECASE)
+        self._hs_db = self._build_hyperscan_db() if HAVE_HYPERSCAN else None
+        
+        # FIREWALL_TYPE is fixed for the life of the agent, so drop the
+        # block parser its log format can never match
+        self.parse_event = self._make_parse_event(self.firewall_type.lower())
     
     def _get_log_file(self) -> str:
         """Get firewall log file path based on type."""
@@ -68,221 +165,323 @@ class FirewallAgent:
         return log_paths.get(fw_type, log_paths["generic"])
     
     def _get_firewall_patterns(self) -> Dict:
-        """Get regex patterns for firewall event detection."""
+        """
+        Get regex patterns for firewall event detection.
+        Patterns are lowercase and run against the lowercased line, so none need re.IGNORECASE.
+        iptables/UFW lines are KEY=VAL formatted and parsed by _parse_netfilter instead.
+        """
         return {
-            # iptables/netfilter patterns
-            "iptables_drop": re.compile(
-                r"IN=(?P<in_iface>\S+).*OUT=(?P<out_iface>\S+).*SRC=(?P<src_ip>\S+).*DST=(?P<dst_ip>\S+).*PROTO=(?P<proto>\w+).*SPT=(?P<src_port>\d+).*DPT=(?P<dst_port>\d+)",
-                re.IGNORECASE
-            ),
-            # UFW patterns
-            "ufw_block": re.compile(
-                r"\[UFW BLOCK\].*SRC=(?P<src_ip>\S+).*DST=(?P<dst_ip>\S+).*PROTO=(?P<proto>\w+).*SPT=(?P<src_port>\d+).*DPT=(?P<dst_port>\d+)",
-                re.IGNORECASE
-            ),
             # Generic firewall block pattern
             "generic_block": re.compile(
-                r"(?:blocked|denied|dropped).*from\s+(?P<src_ip>\d+\.\d+\.\d+\.\d+)",
-                re.IGNORECASE
-            ),
-            # Port scan detection
-            "port_scan": re.compile(
-                r"(?:port\s+scan|syn\s+flood|ddos)",
-                re.IGNORECASE
+                r"(?:blocked|denied|dropped).*from\s+(?P<src_ip>\d{1,3}(?:\.\d{1,3}){3})(?!\.?\d)",
+                re.ASCII
             ),
-            # Intrusion attempt
-            "intrusion_attempt": re.compile(
-                r"(?:intrusion|attack|malicious|threat)",
-                re.IGNORECASE
+            # Port scan and intrusion keywords share one alternation;
+            # the matching group name selects the event type
+            "threat": re.compile(
+                r"(?P<scan>port\s+scan|syn\s+flood|ddos)|(?P<intrusion>intrusion|attack|malicious|threat)"
             ),
             # Connection established
             "connection_established": re.compile(
-                r"(?:established|connection.*accepted|allowed)",
-                re.IGNORECASE
+                r"(?:established|connection.*accepted|allowed)"
             )
         }
     
-    def get_file_position(self) -> int:
-        """Get current file size for stateful log reading."""
+    def _build_hyperscan_db(self):
+        """Compile the block/threat gate keywords into a single Hyperscan database."""
         try:
-            return os.path.getsize(self.log_file)
-        except:
-            return 0
+            keywords = self._block_keywords + self._threat_keywords
+            db = hyperscan.Database()
+            db.compile(
+                expressions=[b"|".join(re.escape(k).encode() for k in keywords)],
+                ids=[0],
+                elements=1,
+                flags=[hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_SINGLEMATCH]
+            )
+            return db
+        except Exception as e:
+            print(f"Warning: Hyperscan unavailable, using regex gates only: {e}")
+            return None
     
-    def read_new_lines(self) -> List[str]:
-        """Read only new lines from log file."""
-        lines = []
-        
+    @staticmethod
+    def _on_hs_match(pattern_id, start, end, flags, context):
+        """Hyperscan match callback - records that the line hit a gate keyword."""
+        context.append(pattern_id)
+    
+    def _is_candidate(self, line: str) -> bool:
+        """Return True if the line contains any keyword parse_event can act on."""
+        if self._hs_db is not None:
+            hits = []
+            self._hs_db.scan(line.encode(), match_event_handler=self._on_hs_match, context=hits)
+            return bool(hits)
+        return self._gate_re.search(line) is not None
+    
+    def read_new_lines(self) -> Iterator[str]:
+        """
+        Yield only new lines from log file.
+        Lines are streamed from the buffered reader rather than loaded as one list.
+        """
         try:
-            if not os.path.exists(self.log_file):
+            try:
+                f = open(self.log_file, 'r', errors='ignore', buffering=self.READ_BUFFER_SIZE)
+            except FileNotFoundError:
                 print(f"Warning: Firewall log file not found: {self.log_file}")
-                return lines
+                return
             
-            current_position = self.get_file_position()
-            
-            # If file was rotated, start from beginning
-            if current_position < self.last_position:
-                self.last_position = 0
-            
-            with open(self.log_file, 'r', errors='ignore') as f:
-                f.seek(self.last_position)
-                lines = f.readlines()
+            with f:
+                # One fstat on the open handle covers both rotation checks
+                st = os.fstat(f.fileno())
+                
+                # If file was truncated or replaced (new inode), start from beginning
+                if st.st_size < self.last_position or (self.last_inode is not None and st.st_ino != self.last_inode):
+                    self.last_position = 0
+                self.last_inode = st.st_ino
+                
+                start = self.last_position
+                self._fadvise(f, start, 0, "POSIX_FADV_SEQUENTIAL")
+                
+                f.seek(start)
+                # readline() rather than iterating f keeps f.tell() usable
+                while True:
+                    line = f.readline()
+                    if not line:
+                        break
+                    yield line
                 self.last_position = f.tell()
+                
+                # Lines already parsed will not be read again; let the kernel drop their pages
+                self._fadvise(f, start, self.last_position - start, "POSIX_FADV_DONTNEED")
         
         except Exception as e:
             print(f"Error reading log file: {e}")
-        
-        return lines
+    
+    @staticmethod
+    def _fadvise(f, offset: int, length: int, advice: str):
+        """Pass a page-cache hint for f to the kernel where posix_fadvise is supported."""
+        if not hasattr(os, "posix_fadvise"):
+            return
+        try:
+            os.posix_fadvise(f.fileno(), offset, length, getattr(os, advice))
+        except OSError:
+            pass
+    
+    def _parse_netfilter(self, line: str) -> Optional[Dict[str, str]]:
+        """
+        Split an iptables/UFW log line into its KEY=VAL fields.
+        Returns None unless all fields needed for a block event are present and valid.
+        """
+        fields = dict(tok.split("=", 1) for tok in line.split() if "=" in tok)
+        for key in self.NETFILTER_KEYS:
+            if key not in fields:
+                return None
+        # Ports must be plain numbers of at most five digits
+        for key in ("SPT", "DPT"):
+            port = fields[key]
+            if not (port.isascii() and port.isdigit() and len(port) <= 5):
+                return None
+        return fields
     
     def parse_timestamp(self, line: str) -> str:
         """Extract timestamp from firewall log."""
         try:
-            # Try to match common timestamp formats
-            timestamp_patterns = [
-                r"(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2})",  # ISO format
-                r"(\w{3}\s+\d{1,2}\s+\d{2}:\d{2}:\d{2})",  # Syslog format
-            ]
+            # ISO format
+            match = self.TS_ISO_RE.search(line)
+            if match:
+                return _parse_ts_cached(match.group(1), True, 0)
             
-            for pattern in timestamp_patterns:
-                match = re.search(pattern, line)
-                if match:
-                    timestamp_str = match.group(1)
-                    # Try to parse
-                    try:
-                        dt = datetime.fromisoformat(timestamp_str)
-                        return dt.replace(tzinfo=timezone.utc).isoformat()
-                    except:
-                        # Try syslog format
-                        current_year = datetime.now().year
-                        dt = datetime.strptime(f"{current_year} {timestamp_str}", "%Y %b %d %H:%M:%S")
-                        return dt.replace(tzinfo=timezone.utc).isoformat()
+            # Syslog format; the year is part of the cache key so it rolls over
+            match = self.TS_SYSLOG_RE.search(line)
+            if match:
+                return _parse_ts_cached(match.group(1), False, datetime.now().year)
         except:
             pass
         
         return datetime.now(timezone.utc).isoformat()
     
-    def parse_event(self, line: str) -> Optional[Dict]:
-        """Parse a firewall log line."""
+    def _parse_netfilter_block(self, line: str, lc: str, line_hash: str) -> Optional[tuple]:
+        """Parse an iptables/UFW block line into an event row."""
+        fields = self._parse_netfilter(line)
+        if not fields:
+            return None
+        return (
+            f"{self.source_host}-fw-drop-{line_hash}",  # event_id
+            self.parse_timestamp(line),  # timestamp
+            self.source_host,  # source_host
+            self.os_type,  # os_type
+            "CONNECTION_BLOCKED",  # event_type
+            2,  # severity
+            fields["SRC"],  # source_ip
+            "firewall",  # user
+            f"Blocked {fields['PROTO']} from {fields['SRC']}:{fields['SPT']} to {fields['DST']}:{fields['DPT']}",  # raw_message
+        )
+    
+    def _parse_generic_block(self, line: str, lc: str, line_hash: str) -> Optional[tuple]:
+        """Parse a free-form "blocked/denied/dropped ... from <ip>" line into an event row."""
+        # The regex can only start at one of its leading keywords,
+        # so match() from the first one instead of search()
+        starts = [i for i in (lc.find(k) for k in self.GENERIC_BLOCK_WORDS) if i >= 0]
+        match = self.patterns["generic_block"].match(lc, min(starts)) if starts else None
+        if not match:
+            return None
+        return (
+            f"{self.source_host}-fw-generic-block-{line_hash}",  # event_id
+            self.parse_timestamp(line),  # timestamp
+            self.source_host,  # source_host
+            self.os_type,  # os_type
+            "CONNECTION_BLOCKED",  # event_type
+            2,  # severity
+            match.group("src_ip"),  # source_ip
+            "firewall",  # user
+            line.strip(),  # raw_message
+        )
+    
+    def _parse_threat(self, line: str, lc: str, line_hash: str) -> Optional[tuple]:
+        """Parse a port scan or intrusion line into an event row."""
+        # Check for port scans and intrusion attempts in one regex pass.
+        # A scan keyword anywhere on the line wins over an intrusion keyword.
+        threat = None
+        if any(k in lc for k in self._threat_keywords):
+            for match in self.patterns["threat"].finditer(lc):
+                threat = match.lastgroup
+                if threat == "scan":
+                    break
+        
+        if not threat:
+            return None
+        
+        id_tag, event_type, severity = self.THREAT_EVENTS[threat]
+        
+        # Extract source IP if possible
+        src_ip = "N/A"
+        ip_match = self.IPV4_RE.search(line)
+        if ip_match:
+            src_ip = ip_match.group(1)
+        
+        return (
+            f"{self.source_host}-{id_tag}-{line_hash}",  # event_id
+            self.parse_timestamp(line),  # timestamp
+            self.source_host,  # source_host
+            self.os_type,  # os_type
+            event_type,  # event_type
+            severity,  # severity
+            src_ip,  # source_ip
+            "firewall",  # user
+            line.strip(),  # raw_message
+        )
+    
+    def parse_event(self, line: str, line_hash: str) -> Optional[tuple]:
+        """
+        Parse a firewall log line into an event row ordered as EVENT_FIELDS.
+        line_hash is the hex digest computed by collect_events for deduplication.
+        __init__ replaces this with a version specialized for FIREWALL_TYPE.
+        """
         
         if len(line.strip()) < 10:
             return None
         
-        # Generate deterministic hash for the line to prevent duplicates
-        line_hash = hashlib.md5(line.strip().encode()).hexdigest()
+        # Lowercase once for all substring gates below
+        lc = line.lower()
         
         # Check for blocked connections
-        if "drop" in line.lower() or "block" in line.lower() or "denied" in line.lower():
-            match = self.patterns["iptables_drop"].search(line)
-            if match:
-                return {
-                    "event_id": f"{self.source_host}-fw-drop-{line_hash}",
-                    "timestamp": self.parse_timestamp(line),
-                    "source_host": self.source_host,
-                    "os_type": self.os_type,
-                    "event_type": "CONNECTION_BLOCKED",
-                    "severity": 2,
-                    "source_ip": match.group("src_ip"),
-                    "user": "firewall",
-                    "raw_message": f"Blocked {match.group('proto')} from {match.group('src_ip')}:{match.group('src_port')} to {match.group('dst_ip')}:{match.group('dst_port')}"
-                }
-            
-            # Generic block pattern
-            match = self.patterns["generic_block"].search(line)
-            if match:
-                return {
-                    "event_id": f"{self.source_host}-fw-generic-block-{line_hash}",
-                    "timestamp": self.parse_timestamp(line),
-                    "source_host": self.source_host,
-                    "os_type": self.os_type,
-                    "event_type": "CONNECTION_BLOCKED",
-                    "severity": 2,
-                    "source_ip": match.group("src_ip"),
-                    "user": "firewall",
-                    "raw_message": line.strip()
-                }
-        
-        # Check for port scans
-        if self.patterns["port_scan"].search(line):
-            # Extract source IP if possible
-            src_ip = "N/A"
-            ip_match = re.search(r"(\d+\.\d+\.\d+\.\d+)", line)
-            if ip_match:
-                src_ip = ip_match.group(1)
-            
-            return {
-                "event_id": f"{self.source_host}-fw-scan-{line_hash}",
-                "timestamp": self.parse_timestamp(line),
-                "source_host": self.source_host,
-                "os_type": self.os_type,
-                "event_type": "PORT_SCAN",
-                "severity": 4,
-                "source_ip": src_ip,
-                "user": "firewall",
-                "raw_message": line.strip()
-            }
-        
-        # Check for intrusion attempts
-        if self.patterns["intrusion_attempt"].search(line):
-            src_ip = "N/A"
-            ip_match = re.search(r"(\d+\.\d+\.\d+\.\d+)", line)
-            if ip_match:
-                src_ip = ip_match.group(1)
-            
-            return {
-                "event_id": f"{self.source_host}-fw-intrusion-{line_hash}",
-                "timestamp": self.parse_timestamp(line),
-                "source_host": self.source_host,
-                "os_type": self.os_type,
-                "event_type": "CRITICAL_ERROR",
-                "severity": 5,
-                "source_ip": src_ip,
-                "user": "firewall",
-                "raw_message": line.strip()
-            }
-        
-        return None
+        if any(k in lc for k in self._block_keywords):
+            event = self._parse_netfilter_block(line, lc, line_hash) or self._parse_generic_block(line, lc, line_hash)
+            if event:
+                return event
+        
+        return self._parse_threat(line, lc, line_hash)
+    
+    def _make_parse_event(self, fw_type: str) -> Callable[[str, str], Optional[tuple]]:
+        """
+        Build a parse_event that only runs the block parser fw_type's log format can match.
+        Unknown types get the unspecialized method, which tries every parser.
+        """
+        if fw_type in self.NETFILTER_TYPES:
+            parse_block = self._parse_netfilter_block
+        elif fw_type in self.GENERIC_BLOCK_TYPES:
+            parse_block = self._parse_generic_block
+        else:
+            return self.parse_event
+        
+        block_keywords = self._block_keywords
+        parse_threat = self._parse_threat
+        
+        def parse_event(line: str, line_hash: str) -> Optional[tuple]:
+            if len(line.strip()) < 10:
+                return None
+            lc = line.lower()
+            if any(k in lc for k in block_keywords):
+                event = parse_block(line, lc, line_hash)
+                if event:
+                    return event
+            return parse_threat(line, lc, line_hash)
+        
+        return parse_event
     
-    def collect_events(self) -> List[Dict]:
-        """Collect firewall events."""
+    def collect_events(self) -> List[tuple]:
+        """
+        Collect firewall events as rows ordered as EVENT_FIELDS.
+        Rows are only turned into dicts when send_events serializes them.
+        """
         events = []
         
+        # Bind hot-loop lookups to locals once per poll
+        blake2b = hashlib.blake2b
+        seen = self.processed_lines
+        max_seen = self.MAX_PROCESSED_LINES
+        parse_event = self.parse_event
+        append = events.append
+        is_candidate = self._is_candidate
+        
         try:
-            lines = self.read_new_lines()
-            
-            for line in lines:
-                line_hash = hash(line)
-                if line_hash in self.processed_lines:
+            for line in self.read_new_lines():
+                # Lines without any gate keyword cannot produce an event
+                if not is_candidate(line):
                     continue
                 
-                self.processed_lines.add(line_hash)
+                # One deterministic hash per line serves both dedup and event_id
+                line_hash = blake2b(line.strip().encode(), digest_size=8).digest()
+                if line_hash in seen:
+                    seen.move_to_end(line_hash)
+                    continue
                 
-                parsed = self.parse_event(line)
+                seen[line_hash] = None
+                if len(seen) > max_seen:
+                    # Evict the oldest entry instead of forgetting everything at once
+                    seen.popitem(last=False)
+                
+                parsed = parse_event(line, line_hash.hex())
                 if parsed:
-                    events.append(parsed)
-            
-            # Cleanup to prevent memory issues
-            if len(self.processed_lines) > 100000:
-                self.processed_lines = set()
+                    append(parsed)
         
         except Exception as e:
             print(f"Error collecting events: {e}")
         
         return events
     
-    def send_events(self, events: List[Dict]) -> bool:
-        """Send events to the API."""
+    def send_events(self, events: List[tuple]) -> bool:
+        """Send event rows from collect_events to the API."""
         if not events:
             return True
         
         try:
-            log_events = [LogEvent(**event) for event in events]
+            fields = self.EVENT_FIELDS
+            event_dicts = [dict(zip(fields, row)) for row in events]
             
-            headers = {"api-key": self.api_key}
-            payload = {"events": [event.model_dump() for event in log_events]}
+            # Validate against the schema, but serialize the dicts directly
+            for event in event_dicts:
+                LogEvent.model_validate(event)
             
-            response = requests.post(
+            payload = {"events": event_dicts}
+            body = orjson.dumps(payload) if HAVE_ORJSON else json.dumps(payload).encode()
+            
+            headers = {"content-type": "application/json"}
+            if len(body) > self.GZIP_MIN_BYTES:
+                body = gzip.compress(body, compresslevel=1)
+                headers["content-encoding"] = "gzip"
+            
+            response = self.session.post(
                 f"{self.api_url}/ingest",
-                json=payload,
+                data=body,
                 headers=headers,
                 timeout=10
             )
@@ -299,8 +498,22 @@ class FirewallAgent:
             print(f"✗ Error sending events: {e}")
             return False
     
+    def _send_loop(self):
+        """Sender thread - posts queued event batches until it receives None."""
+        while True:
+            events = self._send_queue.get()
+            if events is None:
+                break
+            try:
+                self.send_events(events)
+            except Exception as e:
+                print(f"✗ Error sending events: {e}")
+    
     def run(self, interval: int = 30):
-        """Main agent loop."""
+        """
+        Main agent loop.
+        Batches are handed to a sender thread so a slow POST does not stall log reading.
+        """
         print(f"Firewall Agent starting (host: {self.source_host})")
         print(f"Firewall Type: {self.firewall_type}")
         print(f"Log File: {self.log_file}")
@@ -309,11 +522,15 @@ class FirewallAgent:
         if not os.path.exists(self.log_file):
             print(f"⚠️  Warning: Log file not found: {self.log_file}")
         
+        self._send_queue = queue.Queue(maxsize=self.SEND_QUEUE_SIZE)
+        sender = threading.Thread(target=self._send_loop, name="firewall-sender", daemon=True)
+        sender.start()
+        
         while True:
             try:
                 events = self.collect_events()
                 if events:
-                    self.send_events(events)
+                    self._send_queue.put(events)
                 
                 time.sleep(interval)
             
@@ -323,6 +540,10 @@ class FirewallAgent:
             except Exception as e:
                 print(f"Unexpected error: {e}")
                 time.sleep(interval)
+        
+        # Let the sender flush what is already queued
+        self._send_queue.put(None)
+        sender.join(timeout=15)
 
 
 def main():
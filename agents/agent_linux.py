@@ -11,6 +11,7 @@ import os
 import sys
 import re
 import requests
+from requests.adapters import HTTPAdapter, Retry
 import json
 from datetime import datetime, timezone
 import time
@@ -18,9 +19,13 @@ import socket
 from pathlib import Path
 import uuid
 import hashlib
+import heapq
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dateutil import tz
 import psutil
 import platform
+from typing import Iterable, Iterator
 
 # Force unbuffered output for systemd logging
 sys.stdout.reconfigure(line_buffering=True)
@@ -35,15 +40,164 @@ except ImportError:
     HAVE_CORE_MODELS = False
     # Fallback: just use raw dicts
 
+# Optional: orjson serializes payloads several times faster than stdlib json
+try:
+    import orjson
+    HAVE_ORJSON = True
+except ImportError:
+    HAVE_ORJSON = False
+    # Fallback: stdlib json
+
+# Optional: Hyperscan/Vectorscan finds every matching rule in a single SIMD pass
+try:
+    import hyperscan
+    HAVE_HYPERSCAN = True
+except ImportError:
+    HAVE_HYPERSCAN = False
+    # Fallback: the fused re pattern alone decides
+
+# Optional: watchdog (inotify) wakes the agent as soon as a log file changes
+try:
+    from watchdog.observers import Observer
+    HAVE_WATCHDOG = True
+except ImportError:
+    HAVE_WATCHDOG = False
+    # Fallback: poll the log files every interval
+
+
+class LogChangeHandler:
+    """watchdog event handler that signals when one of the monitored log files changes."""
+    
+    def __init__(self, log_files: list[str], changed: threading.Event):
+        self.paths = {os.path.abspath(p) for p in log_files}
+        self.changed = changed
+    
+    def dispatch(self, event):
+        """Called by the watchdog observer thread for every event in a watched directory."""
+        if event.is_directory:
+            return
+        # Rotation shows up as a move or create of the log path itself
+        if event.src_path in self.paths or getattr(event, "dest_path", None) in self.paths:
+            self.changed.set()
+
+
+class LineBloomFilter:
+    """
+    Fixed-size duplicate filter over 128-bit line digests.
+    Two bit arrays alternate: new digests go into the current one and lookups check both.
+    Once the current one has taken rotate_every digests it becomes the previous one and
+    the oldest is dropped, so memory stays constant and recent lines are never all forgotten at once.
+    """
+    
+    def __init__(self, bits: int = 1 << 23, hashes: int = 7, rotate_every: int = 500000):
+        self.mask = bits - 1  # bits must be a power of two
+        self.hashes = hashes
+        self.rotate_every = rotate_every
+        self.current = bytearray(bits >> 3)
+        self.previous = bytearray(bits >> 3)
+        self.inserted = 0
+        self.lock = threading.Lock()  # add() may be called from several reader threads
+    
+    def _positions(self, digest: bytes) -> list[int]:
+        """Derive the bit positions for a digest by double hashing its two 64-bit halves."""
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:16], "little") | 1
+        mask = self.mask
+        return [(h1 + i * h2) & mask for i in range(self.hashes)]
+    
+    def add(self, digest: bytes) -> bool:
+        """Record a digest. Returns True if it was (probably) seen before."""
+        positions = self._positions(digest)
+        
+        with self.lock:
+            current = self.current
+            previous = self.previous
+            
+            if all(current[p >> 3] & (1 << (p & 7)) for p in positions):
+                return True
+            if all(previous[p >> 3] & (1 << (p & 7)) for p in positions):
+                return True
+            
+            for p in positions:
+                current[p >> 3] |= 1 << (p & 7)
+            
+            self.inserted += 1
+            if self.inserted >= self.rotate_every:
+                self.previous = current
+                self.current = bytearray(len(current))
+                self.inserted = 0
+            return False
+
 
 class LinuxAgent:
     """Collects Linux authentication and system logs."""
     
+    # Detection rules in priority order: pattern key -> (event_id tag, event_type, severity, user).
+    # A user of None takes the user captured by the pattern; source_ip comes from its "ip" group.
+    EVENT_RULES = {
+        "failed_password": ("failed-pwd", "LOGIN_FAIL", 3, None),
+        "failed_password_invalid": ("invalid-user", "LOGIN_FAIL", 3, None),
+        "sudo_command": ("sudo", "SUDO_ESCALATION", 2, None),
+        "web_error_forbidden": ("web-403", "CONNECTION_BLOCKED", 2, "www-data"),
+        "web_attack": ("web-attack", "WEB_ATTACK", 4, "unknown"),
+        "web_attack_sql": ("web-attack", "WEB_ATTACK", 4, "unknown"),
+        "postfix_auth_fail": ("mail-fail", "LOGIN_FAIL", 3, "mail-user"),
+        "dovecot_auth_fail": ("mail-fail", "LOGIN_FAIL", 3, "mail-user"),
+        "oom_kill": ("oom", "CRITICAL_ERROR", 5, "system"),
+        "kernel_warning": ("kernel-warn", "SYSTEM_ALERT", 4, "kernel"),
+        "systemd_failure": ("systemd-fail", "SYSTEM_ALERT", 4, "systemd"),
+        "systemd_unit_failure": ("systemd-fail", "SYSTEM_ALERT", 4, "systemd"),
+        "docker_error": ("docker-err", "SYSTEM_ALERT", 4, "docker"),
+        # General Error - catchall, lower severity than specific ones
+        "generic_error": ("generic-err", "SYSTEM_ALERT", 3, "system"),
+    }
+    
+    # Seconds to let writes settle after a change notification before collecting
+    WATCH_DEBOUNCE = 1.0
+    
+    # Lowercase literals one of which appears in every line the rule's pattern matches.
+    # Lines containing none of them skip the regexes entirely.
+    RULE_LITERALS = {
+        "failed_password": ("failed password",),
+        "failed_password_invalid": ("invalid user",),
+        "sudo_command": ("sudo",),
+        "web_error_forbidden": ("denied", "forbidden"),
+        "web_attack": ("select", "<script>", "eval(", "/etc/passwd", "../..", "%00"),
+        "web_attack_sql": ("select",),
+        "postfix_auth_fail": ("postfix", "dovecot"),
+        "dovecot_auth_fail": ("postfix", "dovecot"),
+        "oom_kill": ("out of memory", "oom-killer"),
+        "kernel_warning": ("kernel:",),
+        "systemd_failure": ("systemd",),
+        "systemd_unit_failure": ("systemd",),
+        "docker_error": ("docker",),
+        "generic_error": ("error", "failed", "denied", "warning", "critical", "failure", "problem", "invalid"),
+    }
+    
+    # Words one of which must also appear (any case) before a rule is considered
+    RULE_GATES = {
+        "sudo_command": ("sudo",),
+        "postfix_auth_fail": ("postfix", "dovecot"),
+        "dovecot_auth_fail": ("postfix", "dovecot"),
+    }
+    
     def __init__(self, api_url: str = "http://localhost:8000", api_key: str = "default-insecure-key-change-me"):
         self.api_url = api_url
         self.api_key = api_key
         self.source_host = socket.gethostname()
         self.os_type = "LINUX"
+        self.validate_events = HAVE_CORE_MODELS and os.getenv("DEBUG", "false").lower() == "true"
+        
+        # Persistent HTTP session so events, heartbeats and status reuse pooled keep-alive connections
+        self.session = requests.Session()
+        self.session.headers.update({
+            "api-key": api_key,
+            "source-host": self.source_host,
+            "os-type": self.os_type
+        })
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=4, max_retries=Retry(total=3, backoff_factor=0.5))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
         
         # Configure log files to monitor
         self.log_files = []
@@ -67,9 +221,28 @@ class LinuxAgent:
         
         self.state_file = ".linux_agent_state"
         self.file_states = self._load_state()
-        self.processed_lines = set()  # Track processed lines to avoid duplicates
         
-        # Regex patterns for event detection
+        # Worker threads for reading several log files at once
+        self.pool = None
+        if len(self.log_files) > 1:
+            self.pool = ThreadPoolExecutor(max_workers=min(4, len(self.log_files)), thread_name_prefix="log-reader")
+        self.file_stats = {}  # path -> (inode, size) as of the last read, kept in memory only
+        self._state_dirty = False
+        self.processed_lines = LineBloomFilter()  # Track processed lines to avoid duplicates
+        
+        # Syslog timestamp prefix and the year it is assumed to fall in (refreshed once a minute)
+        self._ts_re = re.compile(r"(\w{3}\s+\d{1,2}\s+\d{2}:\d{2}:\d{2})")
+        self._year = datetime.now().year
+        self._year_checked = time.time()
+        
+        # Local timezone and its display name (refreshed hourly to follow DST changes)
+        self._tz_local = tz.tzlocal()
+        self._tz_name = None
+        self._tz_name_checked = 0.0
+        
+        # Regex patterns for event detection. A ".*" gap may only appear at the top level of a
+        # pattern (see _build_master_patterns); a rule needing one inside an alternation is
+        # split into two rules with the same event tag instead.
         self.patterns = {
             # Authentication (SSH/System)
             "failed_password": re.compile(
@@ -81,7 +254,7 @@ class LinuxAgent:
                 re.IGNORECASE
             ),
             "sudo_command": re.compile(
-                r"(?P<user>\S+) : TTY=\S+ ; PWD=\S+ ; USER=\S+ ; COMMAND=(?P<command>.*)",
+                r"(?:^|\s)(?P<user>\S+) : TTY=\S+ ; PWD=\S+ ; USER=\S+ ; COMMAND=(?P<command>.*)",
                 re.IGNORECASE
             ),
             "authentication_failure": re.compile(
@@ -91,21 +264,25 @@ class LinuxAgent:
             
             # Web Server (Nginx/Apache)
             "web_error_forbidden": re.compile(
-                r"(client denied by server configuration|access forbidden|Directory index forbidden|permission denied).*client: (?P<ip>\d+\.\d+\.\d+\.\d+)",
+                r"(client denied by server configuration|access forbidden|Directory index forbidden|permission denied).*client: (?P<ip>\d{1,3}(?:\.\d{1,3}){3})",
                 re.IGNORECASE
             ),
             "web_attack": re.compile(
-                r"(UNION SELECT|SELECT.*FROM|<script>|eval\(|/etc/passwd|\.\./\.\.|%00).*(?P<ip>\d+\.\d+\.\d+\.\d+)",
+                r"(UNION SELECT|<script>|eval\(|/etc/passwd|\.\./\.\.|%00).*(?P<ip>\d{1,3}(?:\.\d{1,3}){3})",
+                re.IGNORECASE
+            ),
+            "web_attack_sql": re.compile(
+                r"SELECT.*FROM.*(?P<ip>\d{1,3}(?:\.\d{1,3}){3})",
                 re.IGNORECASE
             ),
             
             # Email Server (Postfix/Dovecot)
             "postfix_auth_fail": re.compile(
-                r"warning: .*\[(?P<ip>\d+\.\d+\.\d+\.\d+)\]: SASL .* authentication failed",
+                r"warning: .*\[(?P<ip>\d{1,3}(?:\.\d{1,3}){3})\]: SASL .* authentication failed",
                 re.IGNORECASE
             ),
             "dovecot_auth_fail": re.compile(
-                r"auth-worker.*\(?,(?P<ip>\d+\.\d+\.\d+\.\d+)\):.*password mismatch",
+                r"auth-worker.*\(?,(?P<ip>\d{1,3}(?:\.\d{1,3}){3})\):.*password mismatch",
                 re.IGNORECASE
             ),
             
@@ -116,16 +293,20 @@ class LinuxAgent:
             ),
             
             # Generic System Errors/Warnings
+            # Matched case-sensitively against the lowercased line (see parse_event)
             "generic_error": re.compile(
-                r"(error|failed|denied|permission denied|warning|critical|failure|problem|invalid)\b",
-                re.IGNORECASE
+                r"(error|failed|denied|permission denied|warning|critical|failure|problem|invalid)\b"
             ),
             "kernel_warning": re.compile(
                 r"kernel:.*(warn|error|crit|fail|bug|panic|corrupt)",
                 re.IGNORECASE
             ),
             "systemd_failure": re.compile(
-                r"systemd.*(failed to start|error starting|unit.*failed|emergency mode)",
+                r"systemd.*(failed to start|error starting|emergency mode)",
+                re.IGNORECASE
+            ),
+            "systemd_unit_failure": re.compile(
+                r"systemd.*unit.*failed",
                 re.IGNORECASE
             ),
             "docker_error": re.compile(
@@ -133,6 +314,174 @@ class LinuxAgent:
                 re.IGNORECASE
             )
         }
+        
+        # All rule patterns fused into one regex (see _build_master_patterns)
+        self._master_patterns, self._rule_groups = self._build_master_patterns()
+        self._rule_literals = [self.RULE_LITERALS[name] for name in self.EVENT_RULES]
+        self._generic_kws = self.RULE_LITERALS["generic_error"]
+        
+        # Every rule literal once, as bytes, most common (catch-all) words first
+        self._gate_literals = tuple(dict.fromkeys(
+            literal.encode()
+            for name in ["generic_error", *self.EVENT_RULES]
+            for literal in self.RULE_LITERALS[name]
+        ))
+        self._event_templates, self._event_id_prefixes = self._build_event_templates()
+        self._hs_db = self._build_hyperscan_db() if HAVE_HYPERSCAN else None
+        self._hs_lock = threading.Lock()
+    
+    def _build_master_patterns(self) -> tuple[list, dict]:
+        """
+        Fuse the EVENT_RULES patterns into a single regex, one lookahead branch per rule.
+        Every branch scans the whole line, so the first rule that matches anywhere wins
+        and the priority order is kept. Entry i of the returned list only holds rules
+        i..n and is used to fall through when a rule's own check rejects its match.
+        Also returns rule -> (ip group, user group) names within the fused regex.
+        generic_error is left out; it is always last and parse_event checks it on its own.
+        
+        A pattern's top-level ".*" gaps split it into stages. Each stage before the last is
+        taken at its first occurrence after the previous one, inside a lookahead plus
+        backreference so the engine cannot retry later occurrences. A later occurrence leaves
+        less of the line for the remaining stages, so this finds the same lines, and each
+        branch costs one pass over the line instead of one per occurrence of its keyword.
+        """
+        branches = []
+        rule_groups = {}
+        
+        for name in self.EVENT_RULES:
+            # The catch-all rule is checked separately, after every specific rule has failed
+            if name == "generic_error":
+                continue
+            
+            pattern = self.patterns[name]
+            groups = pattern.groupindex
+            rule_groups[name] = (
+                f"{name}__ip" if "ip" in groups else None,
+                f"{name}__user" if "user" in groups else None,
+            )
+            
+            # Group names must be unique across branches, so prefix them with the rule name
+            source = re.sub(r"\(\?P<(\w+)>", rf"(?P<{name}__\1>", pattern.pattern)
+            
+            gate = ""
+            if name in self.RULE_GATES:
+                words = "|".join(re.escape(w) for w in self.RULE_GATES[name])
+                gate = f"(?=.*?(?:{words}))"
+            
+            # Every stage but the last is pinned to its first occurrence; the last keeps its
+            # greedy gap so its captures (the client IP) stay the last match on the line
+            *leading, last = self._split_gaps(source)
+            stages = "".join(
+                f"(?=(?P<{name}__s{i}>.*?(?:{part})))(?P={name}__s{i})"
+                for i, part in enumerate(leading)
+            )
+            tail = f".*(?:{last})" if leading else f".*?(?:{last})"
+            branches.append(f"{gate}(?=(?P<{name}>{stages}{tail}))")
+        
+        masters = [
+            re.compile("|".join(branches[i:]), re.IGNORECASE)
+            for i in range(len(branches))
+        ]
+        return masters, rule_groups
+    
+    @staticmethod
+    def _split_gaps(source: str) -> list[str]:
+        """Split a regex source at its ".*" gaps outside groups and character classes."""
+        parts = []
+        depth = 0
+        in_class = False
+        start = i = 0
+        while i < len(source):
+            char = source[i]
+            if char == "\\":
+                i += 2
+                continue
+            if in_class:
+                in_class = char != "]"
+            elif char == "[":
+                in_class = True
+            elif char == "(":
+                depth += 1
+            elif char == ")":
+                depth -= 1
+            elif depth == 0 and source.startswith(".*", i):
+                parts.append(source[start:i])
+                i += 2
+                start = i
+                continue
+            i += 1
+        parts.append(source[start:])
+        return parts
+    
+    def _build_event_templates(self) -> tuple[dict, dict]:
+        """
+        Build one event dict per rule holding every field that does not depend on the line,
+        plus each rule's event_id prefix. parse_event copies a template instead of building
+        a nine-key dict per event.
+        """
+        templates = {}
+        id_prefixes = {}
+        for name, (id_tag, event_type, severity, user) in self.EVENT_RULES.items():
+            templates[name] = {
+                "event_id": None,
+                "timestamp": None,
+                "source_host": self.source_host,
+                "os_type": self.os_type,
+                "event_type": event_type,
+                "severity": severity,
+                "source_ip": None,
+                "user": user,
+                "raw_message": None
+            }
+            id_prefixes[name] = f"{self.source_host}-{id_tag}-"
+        return templates, id_prefixes
+    
+    def _build_hyperscan_db(self):
+        """
+        Compile every rule pattern into one Hyperscan database.
+        Match ids are rule positions in EVENT_RULES, so the lowest id is the winning rule.
+        """
+        try:
+            # Hyperscan does not report captures; plain groups keep the patterns portable
+            expressions = [
+                re.sub(r"\(\?P<\w+>", "(", self.patterns[name].pattern).encode()
+                for name in self.EVENT_RULES
+            ]
+            db = hyperscan.Database()
+            db.compile(
+                expressions=expressions,
+                ids=list(range(len(expressions))),
+                elements=len(expressions),
+                flags=[hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_SINGLEMATCH] * len(expressions)
+            )
+            return db
+        except Exception as e:
+            print(f"[WARN] Hyperscan unavailable, using re patterns only: {e}")
+            return None
+    
+    @staticmethod
+    def _on_hs_match(rule_id, start, end, flags, context):
+        """Hyperscan match callback - records which rules hit the line."""
+        context.append(rule_id)
+    
+    def _first_candidate_rule(self, line_bytes: bytes, lowered: str):
+        """
+        Return the position in EVENT_RULES of the first rule that could match the line,
+        or None if none can. Uses Hyperscan when available, otherwise RULE_LITERALS.
+        Takes the line already encoded and already lowercased.
+        """
+        if self._hs_db is not None:
+            hits = []
+            # One Hyperscan scratch space per database, so scans from reader threads take turns
+            with self._hs_lock:
+                self._hs_db.scan(line_bytes, match_event_handler=self._on_hs_match, context=hits)
+            return min(hits) if hits else None
+        
+        for rule_index, literals in enumerate(self._rule_literals):
+            for literal in literals:
+                if literal in lowered:
+                    return rule_index
+        return None
     
     def _load_state(self) -> dict:
         """Load the file read positions from state file."""
@@ -163,39 +512,47 @@ class LinuxAgent:
         except Exception as e:
             print(f"[ERROR] Could not save state file: {e}")
 
-    def get_file_position(self, file_path):
-        """Get current file size for stateful log reading."""
-        try:
-            return os.path.getsize(file_path)
-        except:
-            return 0
-    
-    def read_new_lines(self, file_path: str) -> list[str]:
-        """Read only new lines from a specific log file."""
-        lines = []
-        
+    def read_new_lines(self, file_path: str) -> Iterator[str]:
+        """
+        Yield only new lines from a specific log file.
+        Lines are streamed from a large read buffer rather than loaded as one list;
+        the new position is recorded once the file is exhausted (saved by collect_events).
+        """
         try:
-            # Check if file exists and is readable
-            if not os.path.exists(file_path):
-                return lines
+            try:
+                st = os.stat(file_path)
+            except FileNotFoundError:
+                return
+            
+            # Nothing was appended since the last read - skip open/seek entirely
+            stat_key = (st.st_ino, st.st_size)
+            cached = self.file_stats.get(file_path)
+            if cached == stat_key:
+                return
             
-            current_size = self.get_file_position(file_path)
             last_pos = self.file_states.get(file_path, 0)
             
-            # If file was rotated or size decreased, start from beginning
-            if current_size < last_pos:
+            # A new inode means the file was rotated; a smaller size means it was truncated
+            if (cached is not None and cached[0] != st.st_ino) or st.st_size < last_pos:
                 last_pos = 0
             
-            with open(file_path, 'r', errors='ignore') as f:
+            with open(file_path, 'r', errors='ignore', buffering=1 << 20) as f:
                 f.seek(last_pos)
-                lines = f.readlines()
-                self.file_states[file_path] = f.tell()
-                self._save_state()  # Save state after reading
+                # readline() rather than iterating f keeps f.tell() usable
+                while True:
+                    line = f.readline()
+                    if not line:
+                        break
+                    yield line
+                new_pos = f.tell()
+            
+            if new_pos != self.file_states.get(file_path):
+                self.file_states[file_path] = new_pos
+                self._state_dirty = True
+            self.file_stats[file_path] = (st.st_ino, new_pos)
         
         except Exception as e:
             print(f"Error reading log file {file_path}: {e}")
-        
-        return lines
     
     def parse_timestamp(self, line: str) -> str:
         """
@@ -204,16 +561,19 @@ class LinuxAgent:
         """
         try:
             # Try to extract date from the beginning of the line
-            date_match = re.match(r"(\w{3}\s+\d{1,2}\s+\d{2}:\d{2}:\d{2})", line)
+            date_match = self._ts_re.match(line)
             if date_match:
                 date_str = date_match.group(1)
                 # Add current year (Linux logs don't include year)
-                current_year = datetime.now().year
-                dt = datetime.strptime(f"{current_year} {date_str}", "%Y %b %d %H:%M:%S")
+                now = time.time()
+                if now - self._year_checked > 60:
+                    self._year = datetime.now().year
+                    self._year_checked = now
+                dt = datetime.strptime(f"{self._year} {date_str}", "%Y %b %d %H:%M:%S")
                 
                 # Assign local timezone to naive datetime
                 # This fixes the issue where local logs were blindly treated as UTC
-                dt_local = dt.replace(tzinfo=tz.tzlocal())
+                dt_local = dt.replace(tzinfo=self._tz_local)
                 
                 # Return ISO string with local timezone offset (e.g., -05:00)
                 # The server/dashboard will handle the conversion/display
@@ -225,195 +585,137 @@ class LinuxAgent:
         # Fallback to current UTC time if parsing fails
         return datetime.now(timezone.utc).isoformat()
     
+    def _get_tz_name(self) -> str:
+        """Return the local timezone name for context logging, looked up at most once an hour."""
+        now = time.time()
+        if self._tz_name is None or now - self._tz_name_checked > 3600:
+            try:
+                self._tz_name = datetime.now(self._tz_local).tzname() or "LOCAL"
+            except Exception:
+                self._tz_name = "LOCAL"
+            self._tz_name_checked = now
+        return self._tz_name
+    
     def parse_event(self, line: str) -> dict:
         """
         Parse a log line and extract relevant information.
         Returns None if the line is not a security event we care about.
         """
+        stripped = line.strip()
+        return self._parse_stripped(stripped, stripped.encode())
+    
+    def _parse_stripped(self, stripped: str, stripped_b: bytes, digest: bytes = None) -> dict:
+        """
+        parse_event for a line that is already stripped and encoded.
+        digest is the BLAKE2b digest parse_batch computed for deduplication, if any.
+        """
         
         # Skip short lines
-        if len(line.strip()) < 10:
+        if len(stripped) < 10:
             return None
         
-        # Generate deterministic hash for the line to prevent duplicates
-        line_hash = hashlib.md5(line.strip().encode()).hexdigest()
+        # Lowercase once; everything below reuses this copy
+        lowered = stripped.lower()
         
-        # Get local timezone name for context logging
-        try:
-            tz_name = datetime.now(tz.tzlocal()).tzname()
-        except:
-            tz_name = "LOCAL"
+        # Rules before the first candidate cannot match; no candidate means no event
+        rule_index = self._first_candidate_rule(stripped_b, lowered)
+        if rule_index is None:
+            return None
+        
+        # Deterministic hash of the line for the event_id, shared with deduplication
+        if digest is None:
+            digest = hashlib.blake2b(stripped_b, digest_size=16).digest()
+        line_hash = digest.hex()
+        
+        # Prepend local timezone name to message for visibility
+        msg_with_tz = f"[{self._get_tz_name()}] {stripped}"
+        
+        # One fused regex pass finds the highest-priority rule matching the line.
+        # It runs from the first candidate rule for the captures and rule gates.
+        masters = self._master_patterns
+        match = None
+        while rule_index < len(masters):
+            match = masters[rule_index].match(stripped)
+            if not match:
+                break
             
-        # Prepend timezone to message for visibility
-        msg_with_tz = f"[{tz_name}] {line.strip()}"
+            # Only log sudo if it looks like an actual command (not just sudo setup)
+            if match.lastgroup == "sudo_command":
+                command = match.group("sudo_command__command")
+                if not ("/" in command or "=" not in command[:5]):
+                    rule_index = list(self.EVENT_RULES).index("sudo_command") + 1
+                    match = None
+                    continue
+            break
         
-        # Pattern 1: Failed password
-        match = self.patterns["failed_password"].search(line)
         if match:
-            return {
-                "event_id": f"{self.source_host}-failed-pwd-{line_hash}",
-                "timestamp": self.parse_timestamp(line),
-                "source_host": self.source_host,
-                "os_type": self.os_type,
-                "event_type": "LOGIN_FAIL",
-                "severity": 3,
-                "source_ip": match.group("ip"),
-                "user": match.group("user"),
-                "raw_message": msg_with_tz
-            }
+            name = match.lastgroup
+            ip_group, user_group = self._rule_groups[name]
+            source_ip = match.group(ip_group) if ip_group else "N/A"
+            matched_user = match.group(user_group) if user_group else None
+        elif any(kw in lowered for kw in self._generic_kws) and self.patterns["generic_error"].search(lowered):
+            # General Error - catchall: substring gate, then the word-boundary check on the lowered line
+            name = "generic_error"
+            source_ip = "N/A"
+            matched_user = None
+        else:
+            return None
         
-        # Pattern 2: Invalid user
-        match = self.patterns["failed_password_invalid"].search(line)
-        if match:
-            return {
-                "event_id": f"{self.source_host}-invalid-user-{line_hash}",
-                "timestamp": self.parse_timestamp(line),
-                "source_host": self.source_host,
-                "os_type": self.os_type,
-                "event_type": "LOGIN_FAIL",
-                "severity": 3,
-                "source_ip": match.group("ip"),
-                "user": match.group("user"),
-                "raw_message": msg_with_tz
-            }
+        # Copy the rule's prebuilt event and fill in only the per-line fields
+        event = self._event_templates[name].copy()
+        event["event_id"] = f"{self._event_id_prefixes[name]}{line_hash}"
+        event["timestamp"] = self.parse_timestamp(stripped)
+        event["source_ip"] = source_ip
+        if event["user"] is None:
+            event["user"] = matched_user
+        event["raw_message"] = msg_with_tz
+        return event
+    
+    def parse_batch(self, lines: Iterable[str]) -> list[dict]:
+        """
+        Deduplicate and parse a batch of log lines.
+        Hot-loop lookups are bound to locals once per batch rather than resolved per line.
+        """
+        events = []
         
-        # Pattern 3: Sudo command execution
-        if "sudo" in line.lower():
-            match = self.patterns["sudo_command"].search(line)
-            if match:
-                command = match.group("command")
-                # Only log if it looks like an actual command (not just sudo setup)
-                if "/" in command or "=" not in command[:5]:
-                    return {
-                        "event_id": f"{self.source_host}-sudo-{line_hash}",
-                        "timestamp": self.parse_timestamp(line),
-                        "source_host": self.source_host,
-                        "os_type": self.os_type,
-                        "event_type": "SUDO_ESCALATION",
-                        "severity": 2,
-                        "source_ip": "N/A",
-                        "user": match.group("user"),
-                        "raw_message": msg_with_tz
-                    }
-        
-        # Web Server Events
-        match = self.patterns["web_error_forbidden"].search(line)
-        if match:
-            return {
-                "event_id": f"{self.source_host}-web-403-{line_hash}",
-                "timestamp": self.parse_timestamp(line),
-                "source_host": self.source_host,
-                "os_type": self.os_type,
-                "event_type": "CONNECTION_BLOCKED",
-                "severity": 2,
-                "source_ip": match.group("ip"),
-                "user": "www-data",
-                "raw_message": msg_with_tz
-            }
+        blake2b = hashlib.blake2b
+        seen = self.processed_lines.add
+        parse_stripped = self._parse_stripped
+        append = events.append
+        gate_literals = self._gate_literals
+        
+        for line in lines:
+            # Strip and encode once; the bytes feed the one hash per line,
+            # which serves both dedup (global across all files) and the event_id
+            stripped = line.strip()
+            stripped_b = stripped.encode()
             
-        match = self.patterns["web_attack"].search(line)
-        if match:
-            return {
-                "event_id": f"{self.source_host}-web-attack-{line_hash}",
-                "timestamp": self.parse_timestamp(line),
-                "source_host": self.source_host,
-                "os_type": self.os_type,
-                "event_type": "WEB_ATTACK",
-                "severity": 4,
-                "source_ip": match.group("ip"),
-                "user": "unknown",
-                "raw_message": msg_with_tz
-            }
-
-        # Mail Server Events
-        if "postfix" in line.lower() or "dovecot" in line.lower():
-            match = self.patterns["postfix_auth_fail"].search(line) or self.patterns["dovecot_auth_fail"].search(line)
-            if match:
-                return {
-                    "event_id": f"{self.source_host}-mail-fail-{line_hash}",
-                    "timestamp": self.parse_timestamp(line),
-                    "source_host": self.source_host,
-                    "os_type": self.os_type,
-                    "event_type": "LOGIN_FAIL",
-                    "severity": 3,
-                    "source_ip": match.group("ip"),
-                    "user": "mail-user",
-                    "raw_message": msg_with_tz
-                }
-
-        # System Critical Events
-        if self.patterns["oom_kill"].search(line):
-            return {
-                "event_id": f"{self.source_host}-oom-{line_hash}",
-                "timestamp": self.parse_timestamp(line),
-                "source_host": self.source_host,
-                "os_type": self.os_type,
-                "event_type": "CRITICAL_ERROR",
-                "severity": 5,
-                "source_ip": "N/A",
-                "user": "system",
-                "raw_message": msg_with_tz
-            }
-
-        # Generic System Alerts
-        match = self.patterns["kernel_warning"].search(line)
-        if match:
-            return {
-                "event_id": f"{self.source_host}-kernel-warn-{line_hash}",
-                "timestamp": self.parse_timestamp(line),
-                "source_host": self.source_host,
-                "os_type": self.os_type,
-                "event_type": "SYSTEM_ALERT",
-                "severity": 4, # High Severity
-                "source_ip": "N/A",
-                "user": "kernel",
-                "raw_message": msg_with_tz
-            }
-
-        match = self.patterns["systemd_failure"].search(line)
-        if match:
-            return {
-                "event_id": f"{self.source_host}-systemd-fail-{line_hash}",
-                "timestamp": self.parse_timestamp(line),
-                "source_host": self.source_host,
-                "os_type": self.os_type,
-                "event_type": "SYSTEM_ALERT",
-                "severity": 4, # High Severity
-                "source_ip": "N/A",
-                "user": "systemd",
-                "raw_message": msg_with_tz
-            }
-
-        match = self.patterns["docker_error"].search(line)
-        if match:
-            return {
-                "event_id": f"{self.source_host}-docker-err-{line_hash}",
-                "timestamp": self.parse_timestamp(line),
-                "source_host": self.source_host,
-                "os_type": self.os_type,
-                "event_type": "SYSTEM_ALERT",
-                "severity": 4, # High Severity
-                "source_ip": "N/A",
-                "user": "docker",
-                "raw_message": msg_with_tz
-            }
+            # Lines without any rule literal cannot become events - drop them
+            # before they cost a hash, a filter lookup or a regex
+            lowered_b = stripped_b.lower()
+            for literal in gate_literals:
+                if literal in lowered_b:
+                    break
+            else:
+                continue
+            
+            digest = blake2b(stripped_b, digest_size=16).digest()
+            if seen(digest):
+                continue
+            
+            parsed = parse_stripped(stripped, stripped_b, digest)
+            if parsed:
+                append(parsed)
         
-        # General Error - catchall, lower severity than specific ones
-        match = self.patterns["generic_error"].search(line)
-        if match:
-            return {
-                "event_id": f"{self.source_host}-generic-err-{line_hash}",
-                "timestamp": self.parse_timestamp(line),
-                "source_host": self.source_host,
-                "os_type": self.os_type,
-                "event_type": "SYSTEM_ALERT",
-                "severity": 3, # Medium Severity
-                "source_ip": "N/A",
-                "user": "system",
-                "raw_message": msg_with_tz
-            }
-
-        return None
+        return events
+    
+    def _process_file(self, log_file: str) -> list[dict]:
+        """Read and parse the new lines of one log file."""
+        try:
+            return self.parse_batch(self.read_new_lines(log_file))
+        except Exception as e:
+            print(f"Error collecting events from {log_file}: {e}")
+            return []
     
     def collect_events(self) -> list[dict]:
         """
@@ -422,31 +724,26 @@ class LinuxAgent:
         """
         events = []
         
-        for log_file in self.log_files:
-            try:
-                lines = self.read_new_lines(log_file)
-                
-                for line in lines:
-                    # Skip duplicate lines (global dedup across all files)
-                    line_hash = hash(line)
-                    if line_hash in self.processed_lines:
-                        continue
-                    
-                    self.processed_lines.add(line_hash)
-                    
-                    parsed = self.parse_event(line)
-                    if parsed:
-                        events.append(parsed)
-            
-            except Exception as e:
-                print(f"Error collecting events from {log_file}: {e}")
+        # Several log files are read and parsed in parallel; results keep log_files order
+        if self.pool is not None:
+            for file_events in self.pool.map(self._process_file, self.log_files):
+                events.extend(file_events)
+        else:
+            for log_file in self.log_files:
+                events.extend(self._process_file(log_file))
         
-        # Clean up processed_lines if it gets too large
-        if len(self.processed_lines) > 100000:
-            self.processed_lines = set()
+        # Persist read positions once per collection, and only if one of them moved
+        if self._state_dirty:
+            self._save_state()
+            self._state_dirty = False
         
         return events
     
+    @staticmethod
+    def _dump_json(payload: dict) -> bytes:
+        """Serialize a request payload, with orjson when available."""
+        return orjson.dumps(payload) if HAVE_ORJSON else json.dumps(payload).encode()
+    
     def send_events(self, events: list[dict]) -> bool:
         """Send events to the central API."""
         if not events:
@@ -454,19 +751,18 @@ class LinuxAgent:
             return self.send_heartbeat()
         
         try:
-            if HAVE_CORE_MODELS:
-                log_events = [LogEvent(**event) for event in events]
-                payload = {"events": [event.model_dump() for event in log_events]}
-            else:
-                # Use raw dicts if core.models not available
-                payload = {"events": events}
+            # parse_event already builds dicts matching LogEvent and the server validates
+            # every event, so they are only re-checked here in debug mode
+            if self.validate_events:
+                for event in events:
+                    LogEvent.model_validate(event)
             
-            headers = {"api-key": self.api_key}
+            payload = {"events": events}
             
-            response = requests.post(
+            response = self.session.post(
                 f"{self.api_url}/ingest",
-                json=payload,
-                headers=headers,
+                data=self._dump_json(payload),
+                headers={"content-type": "application/json"},
                 timeout=30
             )
             
@@ -487,15 +783,9 @@ class LinuxAgent:
     def send_heartbeat(self) -> bool:
         """Send a heartbeat to keep agent marked as active on dashboard."""
         try:
-            headers = {
-                "api-key": self.api_key,
-                "source-host": self.source_host,
-                "os-type": self.os_type
-            }
-            
-            response = requests.post(
+            # api-key, source-host and os-type headers come from the session
+            response = self.session.post(
                 f"{self.api_url}/heartbeat",
-                headers=headers,
                 timeout=10
             )
             
@@ -547,11 +837,16 @@ class LinuxAgent:
                             "mac": "N/A" # psutil handles MAC differently, simplifying for now
                         })
             
-            # Processes (Top 10 by CPU)
-            top_procs = []
-            for proc in sorted(psutil.process_iter(['pid', 'name', 'username', 'cpu_percent', 'memory_percent']), 
-                               key=lambda p: p.info['cpu_percent'], reverse=True)[:10]:
-                top_procs.append(proc.info)
+            # Processes (Top 10 by CPU) - nlargest keeps a 10-entry heap instead of sorting every process.
+            # process_iter reuses its Process objects between calls, so cpu_percent is a real delta
+            # after the first snapshot, and attrs= fetches each process's fields in one oneshot() pass.
+            top_procs = [
+                proc.info for proc in heapq.nlargest(
+                    10,
+                    psutil.process_iter(['pid', 'name', 'username', 'cpu_percent', 'memory_percent']),
+                    key=lambda p: p.info['cpu_percent'] or 0
+                )
+            ]
             
             # Boot Time
             boot_time = datetime.fromtimestamp(psutil.boot_time()).isoformat()
@@ -582,13 +877,12 @@ class LinuxAgent:
             if not status_data:
                 return False
                 
-            headers = {"api-key": self.api_key}
             payload = {"status": status_data}
             
-            response = requests.post(
+            response = self.session.post(
                 f"{self.api_url}/system-status",
-                json=payload,
-                headers=headers,
+                data=self._dump_json(payload),
+                headers={"content-type": "application/json"},
                 timeout=10
             )
             
@@ -602,29 +896,73 @@ class LinuxAgent:
             print(f"[ERROR] Sending system status: {e}")
             return False
 
+    def _start_watcher(self):
+        """
+        Watch the directories of the log files for changes.
+        Returns the running observer, or None if the agent has to fall back to polling.
+        """
+        if not HAVE_WATCHDOG:
+            return None
+        
+        try:
+            handler = LogChangeHandler(self.log_files, self._log_changed)
+            observer = Observer()
+            for directory in {os.path.dirname(os.path.abspath(p)) for p in self.log_files}:
+                if os.path.isdir(directory):
+                    observer.schedule(handler, directory, recursive=False)
+            observer.daemon = True
+            observer.start()
+            print("[INFO] Watching log files for changes")
+            return observer
+        except Exception as e:
+            print(f"[WARN] File watching unavailable, polling instead: {e}")
+            return None
+    
+    def _wait_for_changes(self, timeout: float, watching: bool):
+        """Sleep until a log file changes (when watching) or the timeout expires."""
+        if timeout <= 0:
+            return
+        if not watching:
+            time.sleep(timeout)
+            return
+        
+        if self._log_changed.wait(timeout):
+            # Let a burst of writes land so it is sent as one batch
+            time.sleep(self.WATCH_DEBOUNCE)
+            self._log_changed.clear()
+    
     def run(self, interval: int = 30):
         """
         Main agent loop.
-        Collect events and send them to the API at regular intervals.
+        Collect events as soon as a log file changes (or every interval when polling),
+        and send heartbeat and system status at regular intervals.
         """
         print(f"Linux Agent starting (host: {self.source_host})")
         print(f"Log files: {', '.join(self.log_files)}")
         print(f"API URL: {self.api_url}")
         
+        self._log_changed = threading.Event()
+        observer = self._start_watcher()
+        next_status = time.monotonic()
+        
         while True:
             try:
                 # 1. Collect and send Logs
                 events = self.collect_events()
                 if events:
                     self.send_events(events)
-                else:
-                    # No new events, just send heartbeat to stay active
-                    self.send_heartbeat()
                 
-                # 2. Collect and send System Status (RMM)
-                self.send_system_status()
+                now = time.monotonic()
+                if now >= next_status:
+                    if not events:
+                        # No new events, just send heartbeat to stay active
+                        self.send_heartbeat()
+                    
+                    # 2. Collect and send System Status (RMM)
+                    self.send_system_status()
+                    next_status = now + interval
                 
-                time.sleep(interval)
+                self._wait_for_changes(next_status - time.monotonic(), observer is not None)
             
             except KeyboardInterrupt:
                 print("Agent stopped by user")
@@ -632,6 +970,9 @@ class LinuxAgent:
             except Exception as e:
                 print(f"Unexpected error: {e}")
                 time.sleep(interval)
+        
+        if observer is not None:
+            observer.stop()
 
 
 def main():
@@ -11,14 +11,21 @@ import os
 import sys
 import re
 import requests
+from requests.adapters import HTTPAdapter, Retry
 import json
-import subprocess
+import gzip
+import queue
+import threading
+import select
+import platform
 from datetime import datetime, timezone
 import time
 import socket
 from pathlib import Path
 import uuid
 import hashlib
+from collections import deque
+from functools import partial
 
 # Add parent directory to path for imports (optional - try to load, but don't require)
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
@@ -30,15 +37,132 @@ except ImportError:
     HAVE_CORE_MODELS = False
     # Fallback: just use raw dicts
 
+# Optional: orjson serializes payloads several times faster than stdlib json
+try:
+    import orjson
+    HAVE_ORJSON = True
+except ImportError:
+    HAVE_ORJSON = False
+    # Fallback: stdlib json
+
+# Optional: Hyperscan/Vectorscan checks every rule against a line in a single SIMD pass
+try:
+    import hyperscan
+    HAVE_HYPERSCAN = True
+except ImportError:
+    HAVE_HYPERSCAN = False
+    # Fallback: the RULE_LITERALS substring gate
+
+
+def line_fingerprint(data: bytes) -> int:
+    """
+    64-bit fingerprint of a stripped log line, used for dedup and event IDs.
+    Always blake2b, so a line gets the same event ID whatever is installed on the host.
+    """
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "big")
+
+
+# Regex patterns for event detection, compiled once at import.
+# sshd, sudo, PAM and the kernel write these messages in fixed case, so no IGNORECASE.
+PATTERNS = {
+    "failed_password": re.compile(r"Failed password for (?P<user>\S+) from (?P<ip>\S+)"),
+    "invalid_user": re.compile(r"Invalid user (?P<user>\S+) from (?P<ip>\S+)"),
+    "sudo_command": re.compile(r"(?P<user>\S+) : TTY=\S+ ; PWD=\S+ ; USER=\S+ ; COMMAND=(?P<command>.*)"),
+    "sudo_failure": re.compile(r"(?P<user>\S+) : authentication failure"),
+    "user_added": re.compile(r"(?P<user>\w+) added to group"),
+    "sudo_access_denied": re.compile(r"(?P<user>\S+) : sorry, you must have a tty to run sudo"),
+    "kernel_audit": re.compile(r"kernel\[.*\]: \*\*\* AUDIT")
+}
+
+# Syslog timestamp at the start of a line: "Month Day HH:MM:SS"
+SYSLOG_TS_RE = re.compile(r"(\w{3})\s+(\d{1,2})\s+(\d{2}):(\d{2}):(\d{2})")
+
+# Syslog month abbreviations (lowercased) -> month number
+MONTHS = {
+    "jan": 1, "feb": 2, "mar": 3, "apr": 4, "may": 5, "jun": 6,
+    "jul": 7, "aug": 8, "sep": 9, "oct": 10, "nov": 11, "dec": 12
+}
+
+
+def combine_patterns(names, exclude=()) -> re.Pattern:
+    """
+    Join the named rule patterns into one alternation, one named group per rule,
+    so a line is scanned once and the rule is read from match.lastgroup.
+    Capture groups are prefixed with the rule name to keep them unique.
+    Returns None when no rule is left.
+    """
+    branches = []
+    for name in names:
+        if name in exclude:
+            continue
+        source = re.sub(r"\(\?P<(\w+)>", rf"(?P<{name}__\1>", PATTERNS[name].pattern)
+        branches.append(f"(?P<{name}>{source})")
+    return re.compile("|".join(branches)) if branches else None
+
 
 class MacOSAgent:
     """Collects macOS authentication and system logs."""
     
+    # Detection rules: pattern key -> (event_id tag, event_type, severity, user).
+    # A user of None takes the user captured by the pattern; source_ip comes from its "ip" group.
+    EVENT_RULES = {
+        "failed_password": ("failed-pwd", "LOGIN_FAIL", 3, None),
+        "invalid_user": ("invalid-user", "LOGIN_FAIL", 3, None),
+        "sudo_command": ("sudo", "SUDO_ESCALATION", 2, None),
+        "sudo_failure": ("sudo-fail", "LOGIN_FAIL", 3, None),
+        "kernel_audit": ("audit", "CRITICAL_ERROR", 4, "system"),
+    }
+    
+    # Rules only reported on lines that mention sudo
+    SUDO_RULES = ("sudo_command", "sudo_failure")
+    
+    # Rules that can occur in each log type; types not listed get every rule.
+    # syslog routes only the auth facilities (sshd, sudo) to auth.log, and only the
+    # installer's own facility to install.log, where no rule applies.
+    LOG_TYPE_RULES = {
+        "auth": ("failed_password", "invalid_user", "sudo_command", "sudo_failure"),
+        "install": (),
+    }
+    
+    # Literals at least one of which is in every line a rule can match
+    RULE_LITERALS = (b"Failed password for ", b"Invalid user ", b"sudo", b"*** AUDIT")
+    
+    # Number of recent line fingerprints remembered for dedup
+    MAX_PROCESSED_LINES = 100000
+    
+    # Seconds to let a burst of log writes land before collecting
+    WATCH_DEBOUNCE = 1.0
+    
+    # LogEvent fields, in payload order
+    EVENT_FIELDS = ("event_id", "timestamp", "source_host", "os_type", "event_type",
+                    "severity", "source_ip", "user", "raw_message")
+    
+    # Request bodies larger than this are gzip-compressed before sending
+    GZIP_MIN_BYTES = 4096
+    GZIP_LEVEL = 3
+    
+    # Event batches waiting for the sender thread; when full the oldest batch is dropped
+    SEND_QUEUE_SIZE = 100
+    # Queued batches are merged up to this many events, and no POST carries more than this
+    MAX_SEND_EVENTS = 5000
+    
     def __init__(self, api_url: str = "http://localhost:8000", api_key: str = "default-insecure-key-change-me"):
         self.api_url = api_url
         self.api_key = api_key
         self.source_host = socket.gethostname()
         self.os_type = "MACOS"
+        self.validate_events = HAVE_CORE_MODELS and os.getenv("DEBUG", "false").lower() == "true"
+        
+        # Persistent HTTP session so events and heartbeats reuse pooled keep-alive connections
+        self.session = requests.Session()
+        self.session.headers.update({
+            "api-key": api_key,
+            "source-host": self.source_host,
+            "os-type": self.os_type
+        })
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=2, max_retries=Retry(total=3, backoff_factor=0.5))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
         
         # Log file paths to monitor
         self.log_files = {
@@ -48,52 +172,74 @@ class MacOSAgent:
         }
         
         self.last_position = {}
+        # Recent fingerprints: the set answers lookups, the deque evicts the oldest
         self.processed_lines = set()
+        self.processed_order = deque()
         
-        # Regex patterns for event detection
-        self.patterns = {
-            "failed_password": re.compile(
-                r"Failed password for (?P<user>\S+) from (?P<ip>\S+)",
-                re.IGNORECASE
-            ),
-            "invalid_user": re.compile(
-                r"Invalid user (?P<user>\S+) from (?P<ip>\S+)",
-                re.IGNORECASE
-            ),
-            "sudo_command": re.compile(
-                r"(?P<user>\S+) : TTY=\S+ ; PWD=\S+ ; USER=\S+ ; COMMAND=(?P<command>.*)",
-                re.IGNORECASE
-            ),
-            "sudo_failure": re.compile(
-                r"(?P<user>\S+) : authentication failure",
-                re.IGNORECASE
-            ),
-            "user_added": re.compile(
-                r"(?P<user>\w+) added to group",
-                re.IGNORECASE
-            ),
-            "sudo_access_denied": re.compile(
-                r"(?P<user>\S+) : sorry, you must have a tty to run sudo",
-                re.IGNORECASE
-            ),
-            "kernel_audit": re.compile(
-                r"kernel\[.*\]: \*\*\* AUDIT",
-                re.IGNORECASE
-            )
-        }
+        # kqueue watching the log files (None when polling)
+        self._kqueue = None
+        self._watch_fds = {}
+        
+        # Year for syslog timestamps (which carry none), refreshed once per collect cycle
+        self._year = None
+        
+        # Line parsers specialized per log type, built on first use
+        self._parsers = {}
+        
+        # macOS version, looked up on first use
+        self._mac_ver = None
+        
+        # Hyperscan database of all rules, used to pick candidate lines (None without hyperscan)
+        self._hs_db = self._build_hyperscan_db() if HAVE_HYPERSCAN else None
     
-    def get_system_version(self) -> str:
-        """Get macOS version."""
+    def _build_hyperscan_db(self):
+        """Compile every rule pattern into one Hyperscan database, ids in EVENT_RULES order."""
         try:
-            result = subprocess.run(
-                ["sw_vers", "-productVersion"],
-                capture_output=True,
-                text=True,
-                timeout=5
+            # Hyperscan does not report captures; plain groups keep the patterns portable
+            expressions = [
+                re.sub(r"\(\?P<\w+>", "(", PATTERNS[name].pattern).encode()
+                for name in self.EVENT_RULES
+            ]
+            db = hyperscan.Database()
+            db.compile(
+                expressions=expressions,
+                ids=list(range(len(expressions))),
+                elements=len(expressions),
+                flags=[hyperscan.HS_FLAG_SINGLEMATCH] * len(expressions)
             )
-            return result.stdout.strip()
-        except:
-            return "Unknown"
+            return db
+        except Exception as e:
+            print(f"Hyperscan unavailable, using rule literals: {e}")
+            return None
+    
+    @staticmethod
+    def _on_hs_match(rule_id, start, end, flags, context):
+        """Hyperscan match callback - records which rules hit the line."""
+        context.append(rule_id)
+    
+    def _is_candidate(self, raw_line: bytes) -> bool:
+        """
+        Whether any rule can match the raw line: a Hyperscan scan when available,
+        otherwise a check for the rule literals. parse_event makes the final decision.
+        """
+        if self._hs_db is not None:
+            hits = []
+            self._hs_db.scan(raw_line, match_event_handler=self._on_hs_match, context=hits)
+            return bool(hits)
+        
+        for literal in self.RULE_LITERALS:
+            if literal in raw_line:
+                return True
+        return False
+    
+    def get_system_version(self) -> str:
+        """Get macOS version, read once from SystemVersion.plist (no sw_vers subprocess)."""
+        if self._mac_ver is None:
+            try:
+                self._mac_ver = platform.mac_ver()[0] or "Unknown"
+            except Exception:
+                self._mac_ver = "Unknown"
+        return self._mac_ver
     
     def get_file_position(self, log_file: str) -> int:
         """Get current file size for stateful log reading."""
@@ -103,7 +249,10 @@ class MacOSAgent:
             return 0
     
     def read_new_lines(self, log_file: str) -> list:
-        """Read only new lines from log file."""
+        """
+        Read only new lines from log file.
+        Lines are returned as undecoded bytes; collect_events decodes only the candidates.
+        """
         lines = []
         
         try:
@@ -117,10 +266,12 @@ class MacOSAgent:
             if current_position < last_position:
                 last_position = 0
             
-            with open(log_file, 'r', errors='ignore') as f:
+            with open(log_file, 'rb') as f:
                 f.seek(last_position)
-                lines = f.readlines()
-                self.last_position[log_file] = f.tell()
+                data = f.read()
+            
+            self.last_position[log_file] = last_position + len(data)
+            lines = data.splitlines()
         
         except Exception as e:
             print(f"Error reading {log_file}: {e}")
@@ -133,139 +284,158 @@ class MacOSAgent:
         macOS typically uses: "Month Day HH:MM:SS hostname process[pid]:"
         """
         try:
-            # Try to extract standard syslog timestamp
-            date_match = re.match(r"(\w{3}\s+\d{1,2}\s+\d{2}:\d{2}:\d{2})", line)
+            # Try to extract standard syslog timestamp; build it directly rather than via strptime
+            date_match = SYSLOG_TS_RE.match(line)
             if date_match:
-                date_str = date_match.group(1)
-                current_year = datetime.now().year
-                dt = datetime.strptime(f"{current_year} {date_str}", "%Y %b %d %H:%M:%S")
-                return dt.replace(tzinfo=timezone.utc).isoformat()
+                month, day, hour, minute, second = date_match.groups()
+                month = MONTHS.get(month.lower())
+                if month:
+                    year = self._year or datetime.now().year
+                    dt = datetime(year, month, int(day), int(hour), int(minute), int(second), tzinfo=timezone.utc)
+                    return dt.isoformat()
         except:
             pass
         
         return datetime.now(timezone.utc).isoformat()
     
-    def parse_event(self, line: str, log_type: str) -> dict:
+    def get_parser(self, log_type: str):
+        """
+        Return the line parser for a log type, specialized to the rules that can occur
+        in it (see LOG_TYPE_RULES), or None if no rule can. Built once per log type.
+        """
+        if log_type not in self._parsers:
+            allowed = self.LOG_TYPE_RULES.get(log_type, self.EVENT_RULES)
+            names = [name for name in self.EVENT_RULES if name in allowed]
+            
+            # The rules' alternation, plus a variant without the sudo rules for lines
+            # that do not mention sudo
+            combined = combine_patterns(names)
+            combined_no_sudo = combine_patterns(names, exclude=self.SUDO_RULES)
+            
+            self._parsers[log_type] = partial(self._parse_line, combined, combined_no_sudo) if combined else None
+        return self._parsers[log_type]
+    
+    def parse_event(self, line: str, log_type: str, fingerprint: int = None) -> dict:
         """
         Parse a macOS log line and extract security events.
+        The line fingerprint is computed here unless the caller already has it.
         """
+        parser = self.get_parser(log_type)
+        if parser is None:
+            return None
+        return parser(line, fingerprint)
+    
+    def _parse_line(self, combined: re.Pattern, combined_no_sudo: re.Pattern, line: str, fingerprint: int = None) -> dict:
+        """Match a line against one log type's rule alternations and build the event."""
         
-        if len(line.strip()) < 10:
+        stripped = line.strip()
+        if len(stripped) < 10:
             return None
         
-        # Generate deterministic hash for the line to prevent duplicates
-        line_hash = hashlib.md5(line.strip().encode()).hexdigest()
-        
-        # Pattern 1: Failed password
-        match = self.patterns["failed_password"].search(line)
-        if match:
-            return {
-                "event_id": f"{self.source_host}-failed-pwd-{line_hash}",
-                "timestamp": self.parse_timestamp(line),
-                "source_host": self.source_host,
-                "os_type": self.os_type,
-                "event_type": "LOGIN_FAIL",
-                "severity": 3,
-                "source_ip": match.group("ip"),
-                "user": match.group("user"),
-                "raw_message": line.strip()
-            }
-        
-        # Pattern 2: Invalid user
-        match = self.patterns["invalid_user"].search(line)
-        if match:
-            return {
-                "event_id": f"{self.source_host}-invalid-user-{line_hash}",
-                "timestamp": self.parse_timestamp(line),
-                "source_host": self.source_host,
-                "os_type": self.os_type,
-                "event_type": "LOGIN_FAIL",
-                "severity": 3,
-                "source_ip": match.group("ip"),
-                "user": match.group("user"),
-                "raw_message": line.strip()
-            }
-        
-        # Pattern 3: Sudo command execution
-        if "sudo" in line.lower():
-            match = self.patterns["sudo_command"].search(line)
-            if match:
-                return {
-                    "event_id": f"{self.source_host}-sudo-{line_hash}",
-                    "timestamp": self.parse_timestamp(line),
-                    "source_host": self.source_host,
-                    "os_type": self.os_type,
-                    "event_type": "SUDO_ESCALATION",
-                    "severity": 2,
-                    "source_ip": "N/A",
-                    "user": match.group("user"),
-                    "raw_message": line.strip()
-                }
-            
-            # Sudo failure
-            match = self.patterns["sudo_failure"].search(line)
-            if match:
-                return {
-                    "event_id": f"{self.source_host}-sudo-fail-{line_hash}",
-                    "timestamp": self.parse_timestamp(line),
-                    "source_host": self.source_host,
-                    "os_type": self.os_type,
-                    "event_type": "LOGIN_FAIL",
-                    "severity": 3,
-                    "source_ip": "N/A",
-                    "user": match.group("user"),
-                    "raw_message": line.strip()
-                }
-        
-        # Pattern 4: Kernel audit messages
-        if self.patterns["kernel_audit"].search(line):
-            return {
-                "event_id": f"{self.source_host}-audit-{line_hash}",
-                "timestamp": self.parse_timestamp(line),
-                "source_host": self.source_host,
-                "os_type": self.os_type,
-                "event_type": "CRITICAL_ERROR",
-                "severity": 4,
-                "source_ip": "N/A",
-                "user": "system",
-                "raw_message": line.strip()
-            }
-        
-        return None
+        # Sudo rules only count on lines that mention sudo, so pick the alternation up front;
+        # one scan over the line then finds the leftmost rule match
+        if "sudo" not in line:
+            combined = combined_no_sudo
+            if combined is None:
+                return None
+        match = combined.search(line)
+        if not match:
+            return None
+        
+        name = match.lastgroup
+        id_tag, event_type, severity, user = self.EVENT_RULES[name]
+        groups = PATTERNS[name].groupindex
+        
+        # Deterministic fingerprint of the line keeps event IDs stable across resends
+        if fingerprint is None:
+            fingerprint = line_fingerprint(stripped.encode())
+        
+        return {
+            "event_id": f"{self.source_host}-{id_tag}-{fingerprint:016x}",
+            "timestamp": self.parse_timestamp(line),
+            "source_host": self.source_host,
+            "os_type": self.os_type,
+            "event_type": event_type,
+            "severity": severity,
+            "source_ip": match.group(f"{name}__ip") if "ip" in groups else "N/A",
+            "user": user if user is not None else match.group(f"{name}__user"),
+            "raw_message": stripped
+        }
     
     def collect_events(self) -> list:
         """
         Collect events from macOS log files.
         """
         events = []
+        is_candidate = self._is_candidate
+        processed = self.processed_lines
+        order = self.processed_order
+        max_processed = self.MAX_PROCESSED_LINES
+        get_parser = self.get_parser
+        self._year = datetime.now().year
         
         try:
             for log_file, log_type in self.log_files.items():
-                if not os.path.exists(log_file):
+                # Log types no rule applies to are not read at all
+                parse = get_parser(log_type)
+                if parse is None or not os.path.exists(log_file):
                     continue
                 
                 lines = self.read_new_lines(log_file)
                 
-                for line in lines:
-                    line_hash = hash(line)
-                    if line_hash in self.processed_lines:
+                for raw_line in lines:
+                    # Skip lines no rule can match before hashing or decoding them
+                    if not is_candidate(raw_line):
+                        continue
+                    
+                    fingerprint = line_fingerprint(raw_line.strip())
+                    if fingerprint in processed:
                         continue
                     
-                    self.processed_lines.add(line_hash)
+                    # Forget the oldest fingerprints instead of dropping all history at once
+                    processed.add(fingerprint)
+                    order.append(fingerprint)
+                    if len(order) > max_processed:
+                        processed.discard(order.popleft())
                     
-                    parsed = self.parse_event(line, log_type)
+                    line = raw_line.decode('utf-8', errors='ignore')
+                    parsed = parse(line, fingerprint)
                     if parsed:
                         events.append(parsed)
-            
-            # Cleanup processed lines to avoid memory buildup
-            if len(self.processed_lines) > 100000:
-                self.processed_lines = set()
         
         except Exception as e:
             print(f"Error collecting events: {e}")
         
         return events
     
+    def _columnar_payload(self, events: list) -> dict:
+        """
+        Pack events into the soa_v1 layout /ingest accepts: one list per field,
+        a single value when every event in the batch shares it, or distinct values
+        plus per-event codes when the field repeats a lot (event type, severity, user).
+        """
+        n = len(events)
+        payload = {"schema": "soa_v1", "n": n}
+        for field in self.EVENT_FIELDS:
+            column = [event[field] for event in events]
+            if column.count(column[0]) == n:
+                payload[field] = column[0]
+                continue
+            
+            codes = {}
+            for value in column:
+                codes.setdefault(value, len(codes))
+            if len(codes) * 2 <= n:
+                payload[field] = {"values": list(codes), "codes": [codes[value] for value in column]}
+            else:
+                payload[field] = column
+        return payload
+    
+    @staticmethod
+    def _dump_json(payload: dict) -> bytes:
+        """Serialize a request payload, with orjson when available."""
+        return orjson.dumps(payload) if HAVE_ORJSON else json.dumps(payload).encode()
+    
     def send_events(self, events: list) -> bool:
         """Send events to the central API."""
         if not events:
@@ -273,18 +443,37 @@ class MacOSAgent:
             return self.send_heartbeat()
         
         try:
-            if HAVE_CORE_MODELS:
-                log_events = [LogEvent(**event) for event in events]
-                payload = {"events": [event.model_dump() for event in log_events]}
-            else:
-                # Use raw dicts if core.models not available
-                payload = {"events": events}
+            # Events are built as dicts matching LogEvent and the server validates
+            # every event, so they are only re-checked here in debug mode
+            if self.validate_events:
+                for event in events:
+                    LogEvent.model_validate(event)
             
-            headers = {"api-key": self.api_key}
+            # The server rejects larger soa_v1 batches, so a big backlog goes out in several posts
+            sent_all = True
+            for start in range(0, len(events), self.MAX_SEND_EVENTS):
+                if not self._post_events(events[start:start + self.MAX_SEND_EVENTS]):
+                    sent_all = False
+            return sent_all
+        
+        except Exception as e:
+            print(f"Error sending events: {e}")
+            return False
+    
+    def _post_events(self, events: list) -> bool:
+        """POST one batch of at most MAX_SEND_EVENTS events as a soa_v1 payload."""
+        try:
+            payload = self._columnar_payload(events)
+            body = self._dump_json(payload)
+            
+            headers = {"content-type": "application/json"}
+            if len(body) > self.GZIP_MIN_BYTES:
+                body = gzip.compress(body, compresslevel=self.GZIP_LEVEL)
+                headers["content-encoding"] = "gzip"
             
-            response = requests.post(
+            response = self.session.post(
                 f"{self.api_url}/ingest",
-                json=payload,
+                data=body,
                 headers=headers,
                 timeout=10
             )
@@ -304,15 +493,9 @@ class MacOSAgent:
     def send_heartbeat(self) -> bool:
         """Send a heartbeat to keep agent marked as active on dashboard."""
         try:
-            headers = {
-                "api-key": self.api_key,
-                "source-host": self.source_host,
-                "os-type": self.os_type
-            }
-            
-            response = requests.post(
+            # api-key, source-host and os-type headers come from the session
+            response = self.session.post(
                 f"{self.api_url}/heartbeat",
-                headers=headers,
                 timeout=10
             )
             
@@ -326,21 +509,146 @@ class MacOSAgent:
             # Silently fail on heartbeat
             return False
     
+    def _start_watcher(self) -> bool:
+        """Create a kqueue for the log files; False means fall back to polling."""
+        if not hasattr(select, "kqueue"):
+            return False
+        
+        try:
+            self._kqueue = select.kqueue()
+        except OSError as e:
+            print(f"kqueue unavailable, polling every interval: {e}")
+            return False
+        
+        self._watch_log_files()
+        return True
+    
+    def _watch_log_files(self):
+        """Register vnode events for every log file that exists and is not yet watched."""
+        flags = select.KQ_EV_ADD | select.KQ_EV_CLEAR
+        fflags = (select.KQ_NOTE_WRITE | select.KQ_NOTE_EXTEND |
+                  select.KQ_NOTE_RENAME | select.KQ_NOTE_DELETE)
+        # O_EVTONLY watches a file without holding its volume open
+        open_flags = getattr(os, "O_EVTONLY", os.O_RDONLY)
+        
+        for log_file, log_type in self.log_files.items():
+            if log_file in self._watch_fds or self.get_parser(log_type) is None:
+                continue
+            try:
+                fd = os.open(log_file, open_flags)
+            except OSError:
+                continue
+            
+            try:
+                event = select.kevent(fd, filter=select.KQ_FILTER_VNODE, flags=flags, fflags=fflags)
+                self._kqueue.control([event], 0, 0)
+            except OSError as e:
+                os.close(fd)
+                print(f"Cannot watch {log_file}: {e}")
+                continue
+            self._watch_fds[log_file] = fd
+    
+    def _unwatch(self, fd: int):
+        """Stop watching a rotated or deleted log file (closing the fd drops its kevent)."""
+        for log_file, watched_fd in list(self._watch_fds.items()):
+            if watched_fd == fd:
+                del self._watch_fds[log_file]
+        os.close(fd)
+    
+    def _wait_for_changes(self, timeout: float):
+        """Sleep until a log file changes (with kqueue) or the timeout expires."""
+        if self._kqueue is None:
+            time.sleep(timeout)
+            return
+        
+        # Pick up files created since the last wait, e.g. after rotation
+        self._watch_log_files()
+        
+        changes = self._kqueue.control(None, len(self.log_files), timeout)
+        if not changes:
+            return
+        
+        for change in changes:
+            if change.fflags & (select.KQ_NOTE_RENAME | select.KQ_NOTE_DELETE):
+                self._unwatch(change.ident)
+        
+        # Let a burst of writes land so it is sent as one batch
+        time.sleep(self.WATCH_DEBOUNCE)
+    
+    def _stop_watcher(self):
+        """Close the kqueue and the watched file descriptors."""
+        for fd in self._watch_fds.values():
+            os.close(fd)
+        self._watch_fds = {}
+        if self._kqueue is not None:
+            self._kqueue.close()
+            self._kqueue = None
+    
+    def _queue_events(self, events: list):
+        """Hand a batch to the sender thread, dropping the oldest batch if the queue is full."""
+        while True:
+            try:
+                self._send_queue.put_nowait(events)
+                return
+            except queue.Full:
+                pass
+            try:
+                dropped = self._send_queue.get_nowait()
+            except queue.Empty:
+                continue
+            print(f"Send queue full, dropped {len(dropped)} events")
+    
+    def _send_loop(self):
+        """Sender thread - merges queued batches into one POST each until it receives None."""
+        while True:
+            events = self._send_queue.get()
+            if events is None:
+                break
+            
+            # Fold in whatever else is already queued, so a backlog goes out in few requests
+            events = list(events)
+            stop = False
+            while len(events) < self.MAX_SEND_EVENTS:
+                try:
+                    more = self._send_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if more is None:
+                    stop = True
+                    break
+                events.extend(more)
+            
+            try:
+                self.send_events(events)
+            except Exception as e:
+                print(f"Error sending events: {e}")
+            if stop:
+                break
+    
     def run(self, interval: int = 30):
         """
         Main agent loop.
+        Collect events as soon as a log file changes (kqueue), or every interval when polling.
+        Batches are handed to a sender thread so a slow or unreachable API does not stall collection.
         """
         print(f"macOS Agent starting (host: {self.source_host})")
         print(f"macOS Version: {self.get_system_version()}")
         print(f"API URL: {self.api_url}")
         
+        if not self._start_watcher():
+            print(f"Polling log files every {interval}s")
+        
+        self._send_queue = queue.Queue(maxsize=self.SEND_QUEUE_SIZE)
+        sender = threading.Thread(target=self._send_loop, name="macos-sender", daemon=True)
+        sender.start()
+        
         while True:
             try:
                 events = self.collect_events()
                 if events:
-                    self.send_events(events)
+                    self._queue_events(events)
                 
-                time.sleep(interval)
+                self._wait_for_changes(interval)
             
             except KeyboardInterrupt:
                 print("Agent stopped by user")
@@ -348,6 +656,15 @@ class MacOSAgent:
             except Exception as e:
                 print(f"Unexpected error: {e}")
                 time.sleep(interval)
+        
+        self._stop_watcher()
+        
+        # Let the sender flush what is already queued
+        try:
+            self._send_queue.put(None, timeout=15)
+            sender.join(timeout=15)
+        except queue.Full:
+            print("Sender still busy, exiting without flushing queued events")
 
 
 def main():
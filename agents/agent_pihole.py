@@ -11,11 +11,14 @@ import os
 import sys
 import sqlite3
 import requests
+from requests.adapters import HTTPAdapter, Retry
 import json
+import gzip
 from datetime import datetime, timezone
 import time
 import socket
 from pathlib import Path
+from typing import Iterator
 
 # Add parent directory to path for imports (optional - try to load, but don't require)
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
@@ -27,21 +30,72 @@ except ImportError:
     HAVE_CORE_MODELS = False
     # Fallback: just use raw dicts
 
+# Optional: orjson serializes payloads several times faster than stdlib json
+try:
+    import orjson
+    HAVE_ORJSON = True
+except ImportError:
+    HAVE_ORJSON = False
+    # Fallback: stdlib json
+
 
 class PiholeAgent:
     """Collects blocked DNS queries from Pi-hole FTL database."""
     
+    # LogEvent fields, in payload order
+    EVENT_FIELDS = ("event_id", "timestamp", "source_host", "os_type", "event_type",
+                    "severity", "source_ip", "user", "raw_message")
+    
+    # Request bodies larger than this are gzip-compressed before sending, at the
+    # fastest level so a Raspberry Pi spends little CPU on it
+    GZIP_MIN_BYTES = 4096
+    GZIP_LEVEL = 1
+    
+    # Let SQLite map up to 256 MB of the database instead of copying pages into its cache
+    MMAP_SIZE = 256 * 1024 * 1024
+    
+    # Blocked queries read and sent per batch, so a long backlog never sits in memory at once
+    QUERY_BATCH_SIZE = 500
+    
     def __init__(self, api_url: str = "http://localhost:8000", api_key: str = "default-insecure-key-change-me"):
         self.api_url = api_url
         self.api_key = api_key
         self.source_host = socket.gethostname()
         self.os_type = "PIHOLE"
+        self.validate_events = HAVE_CORE_MODELS and os.getenv("DEBUG", "false").lower() == "true"
+        
+        # Persistent HTTP session so events and heartbeats reuse pooled keep-alive connections
+        self.session = requests.Session()
+        self.session.headers.update({
+            "api-key": api_key,
+            "source-host": self.source_host,
+            "os-type": self.os_type
+        })
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=2, max_retries=Retry(total=3, backoff_factor=0.5))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
         
         # Path to Pi-hole FTL database
         self.pihole_db = "/etc/pihole/pihole-FTL.db"
         
         # Status codes that represent blocked queries (Pi-hole v5/v6)
-        self.blocked_status_codes = [1, 4, 5, 9, 10, 11]
+        self.blocked_status_codes = frozenset({1, 4, 5, 9, 10, 11})
+        
+        # Bit N set for each blocked status N, so one AND per row replaces the IN list
+        self._blocked_mask = sum(1 << code for code in self.blocked_status_codes)
+        
+        # Read-only connection kept open for the life of the agent
+        self._conn = None
+        
+        # Same statement text on every poll so SQLite reuses the prepared statement
+        self._blocked_query = """
+            SELECT id, timestamp, domain, client, status 
+            FROM queries 
+            WHERE id > ?
+            AND ((1 << status) & ?) != 0
+            ORDER BY id ASC
+            LIMIT ?
+        """
         
         # Track last processed ID to avoid duplicates
         # Initialize with current max ID to prevent re-reading history on restart
@@ -51,19 +105,43 @@ class PiholeAgent:
         if not os.path.exists(self.pihole_db):
             print(f"Warning: Pi-hole database not found at {self.pihole_db}")
             print("This agent must run on the Pi-hole server")
-            
+    
+    def _get_connection(self) -> sqlite3.Connection:
+        """
+        Return the shared read-only connection to the FTL database, opening it on first use.
+        The journal mode is left to FTL, which owns the database.
+        """
+        if self._conn is None:
+            conn = sqlite3.connect(
+                f"file:{self.pihole_db}?mode=ro",
+                uri=True,
+                isolation_level=None,
+                check_same_thread=False
+            )
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA query_only = 1")
+            conn.execute(f"PRAGMA mmap_size = {self.MMAP_SIZE}")
+            self._conn = conn
+        return self._conn
+    
+    def _close_connection(self):
+        """Close the shared connection so the next poll reopens it."""
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except sqlite3.Error:
+                pass
+            self._conn = None
+    
     def _get_max_id(self) -> int:
         """Get the current maximum ID from the Pi-hole database."""
         try:
             if not os.path.exists(self.pihole_db):
                 return 0
-                
-            conn = sqlite3.connect(self.pihole_db)
-            cursor = conn.cursor()
-            cursor.execute("SELECT MAX(id) FROM queries")
+            
+            cursor = self._get_connection().execute("SELECT MAX(id) FROM queries")
             result = cursor.fetchone()
             max_id = result[0] if result and result[0] else 0
-            conn.close()
             
             print(f"Initialized with last_processed_id = {max_id}")
             return max_id
@@ -71,63 +149,57 @@ class PiholeAgent:
             print(f"Error getting initial max ID: {e}")
             return 0
     
-    def query_blocked_domains(self) -> list[dict]:
+    def query_blocked_domains(self) -> Iterator[list[dict]]:
         """
         Query blocked DNS queries from the Pi-hole FTL database.
-        Returns a list of blocked query records.
+        Yields lists of at most QUERY_BATCH_SIZE blocked query records, oldest first.
         """
-        events = []
-        
         try:
-            conn = sqlite3.connect(self.pihole_db)
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-            
-            # Query blocked queries since last check
-            query = """
-                SELECT id, timestamp, domain, client, status 
-                FROM queries 
-                WHERE status IN ({})
-                AND id > ?
-                ORDER BY id ASC
-            """.format(",".join("?" * len(self.blocked_status_codes)))
-            
-            params = self.blocked_status_codes + [self.last_processed_id]
-            
-            cursor.execute(query, params)
-            rows = cursor.fetchall()
+            conn = self._get_connection()
             
-            for row in rows:
-                event = {
-                    "event_id": f"{self.source_host}-pihole-{row['id']}",
-                    "timestamp": datetime.fromtimestamp(
-                        row['timestamp'], 
-                        tz=timezone.utc
-                    ).isoformat(),
-                    "source_host": self.source_host,
-                    "os_type": self.os_type,
-                    "event_type": "DNS_BLOCK",
-                    "severity": 1,  # Informational - blocked DNS is expected
-                    "source_ip": self._sanitize_ip(row['client']),
-                    "user": "pihole",
-                    "raw_message": f"Blocked DNS query for {row['domain']} from {row['client']} (status: {row['status']})"
-                }
+            while True:
+                # Query the next page of blocked queries (id is the rowid, so this is an index seek).
+                # Each page is fetched in full so no read lock is held while it is sent.
+                params = (self.last_processed_id, self._blocked_mask, self.QUERY_BATCH_SIZE)
                 
-                events.append(event)
+                rows = conn.execute(self._blocked_query, params).fetchall()
+                if not rows:
+                    return
                 
-                # Update last processed ID
-                if row['id'] > self.last_processed_id:
-                    self.last_processed_id = row['id']
-            
-            conn.close()
+                events = []
+                for row in rows:
+                    event = {
+                        "event_id": f"{self.source_host}-pihole-{row['id']}",
+                        "timestamp": datetime.fromtimestamp(
+                            row['timestamp'], 
+                            tz=timezone.utc
+                        ).isoformat(),
+                        "source_host": self.source_host,
+                        "os_type": self.os_type,
+                        "event_type": "DNS_BLOCK",
+                        "severity": 1,  # Informational - blocked DNS is expected
+                        "source_ip": self._sanitize_ip(row['client']),
+                        "user": "pihole",
+                        "raw_message": f"Blocked DNS query for {row['domain']} from {row['client']} (status: {row['status']})"
+                    }
+                    
+                    events.append(event)
+                
+                # Rows come back in id order, all above the previous last_processed_id
+                self.last_processed_id = rows[-1]['id']
+                
+                yield events
+                
+                if len(rows) < self.QUERY_BATCH_SIZE:
+                    return
         
         except sqlite3.OperationalError as e:
+            # Reopen on the next poll in case FTL replaced or recreated the database
+            self._close_connection()
             print(f"Database error: {e}")
             print("Make sure this agent is running on the Pi-hole server with database access")
         except Exception as e:
             print(f"Error querying Pi-hole database: {e}")
-        
-        return events
     
     def _sanitize_ip(self, ip: str) -> str:
         """Sanitize and validate IP address."""
@@ -140,6 +212,34 @@ class PiholeAgent:
         
         return ip if ip else "N/A"
     
+    def _columnar_payload(self, events: list) -> dict:
+        """
+        Pack events into the soa_v1 layout /ingest accepts: one list per field,
+        a single value when every event in the batch shares it, or distinct values
+        plus per-event codes when the field repeats a lot (event type, severity, user).
+        """
+        n = len(events)
+        payload = {"schema": "soa_v1", "n": n}
+        for field in self.EVENT_FIELDS:
+            column = [event[field] for event in events]
+            if column.count(column[0]) == n:
+                payload[field] = column[0]
+                continue
+            
+            codes = {}
+            for value in column:
+                codes.setdefault(value, len(codes))
+            if len(codes) * 2 <= n:
+                payload[field] = {"values": list(codes), "codes": [codes[value] for value in column]}
+            else:
+                payload[field] = column
+        return payload
+    
+    @staticmethod
+    def _dump_json(payload: dict) -> bytes:
+        """Serialize a request payload, with orjson when available."""
+        return orjson.dumps(payload) if HAVE_ORJSON else json.dumps(payload).encode()
+    
     def send_events(self, events: list[dict]) -> bool:
         """Send events to the central API."""
         if not events:
@@ -147,18 +247,23 @@ class PiholeAgent:
             return self.send_heartbeat()
         
         try:
-            if HAVE_CORE_MODELS:
-                log_events = [LogEvent(**event) for event in events]
-                payload = {"events": [event.model_dump() for event in log_events]}
-            else:
-                # Use raw dicts if core.models not available
-                payload = {"events": events}
+            # Events are built as dicts matching LogEvent and the server validates
+            # every event, so they are only re-checked here in debug mode
+            if self.validate_events:
+                for event in events:
+                    LogEvent.model_validate(event)
+            
+            payload = self._columnar_payload(events)
+            body = self._dump_json(payload)
             
-            headers = {"api-key": self.api_key}
+            headers = {"content-type": "application/json"}
+            if len(body) > self.GZIP_MIN_BYTES:
+                body = gzip.compress(body, compresslevel=self.GZIP_LEVEL)
+                headers["content-encoding"] = "gzip"
             
-            response = requests.post(
+            response = self.session.post(
                 f"{self.api_url}/ingest",
-                json=payload,
+                data=body,
                 headers=headers,
                 timeout=10
             )
@@ -178,15 +283,9 @@ class PiholeAgent:
     def send_heartbeat(self) -> bool:
         """Send a heartbeat to keep agent marked as active on dashboard."""
         try:
-            headers = {
-                "api-key": self.api_key,
-                "source-host": self.source_host,
-                "os-type": self.os_type
-            }
-            
-            response = requests.post(
+            # api-key, source-host and os-type headers come from the session
+            response = self.session.post(
                 f"{self.api_url}/heartbeat",
-                headers=headers,
                 timeout=10
             )
             
@@ -216,8 +315,7 @@ class PiholeAgent:
         
         while True:
             try:
-                events = self.query_blocked_domains()
-                if events:
+                for events in self.query_blocked_domains():
                     self.send_events(events)
                 
                 time.sleep(interval)
@@ -228,6 +326,8 @@ class PiholeAgent:
             except Exception as e:
                 print(f"Unexpected error: {e}")
                 time.sleep(interval)
+        
+        self._close_connection()
 
 
 def main():
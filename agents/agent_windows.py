@@ -10,8 +10,15 @@ Requires pywin32 on Windows systems.
 import os
 import sys
 import requests
+from requests.adapters import HTTPAdapter, Retry
 import json
-from datetime import datetime
+import gzip
+import heapq
+import queue
+import threading
+from collections import namedtuple
+from functools import partial
+from datetime import datetime, timezone
 import time
 import socket
 import uuid
@@ -31,20 +38,142 @@ if sys.platform == "win32":
             print("    Agent will send heartbeats only")
             WIN32_AVAILABLE = False
 
+# Optional: orjson serializes event batches several times faster than stdlib json
+try:
+    import orjson
+    HAVE_ORJSON = True
+except ImportError:
+    HAVE_ORJSON = False
+    # Fallback: stdlib json
+
+# Evt* API (Vista+) can render events as typed values instead of formatted strings
+EVT_API_AVAILABLE = WIN32_AVAILABLE and hasattr(win32evtlog, "EvtRenderEventValues")
+
 # Standalone agent - no core module dependency needed
 
 
+def _insert(strings, index: int, default: str = "unknown") -> str:
+    """Return StringInserts[index] as text, or default when the event has fewer inserts."""
+    return str(strings[index]) if len(strings) > index else default
+
+
+# StringInserts indexes of (user, source IP) for events whose raw message is just the joined inserts
+USER_IP_INDEXES = {
+    4625: (5, 19),    # Failed logon
+    4624: (5, 18),    # Successful logon (noisy Logon Types 5, 0 etc are ingested at severity 1 for now)
+    4720: (0, None),  # User created
+    4726: (0, None),  # User deleted
+}
+
+# Member added to a global, local or universal group
+GROUP_EVENT_IDS = frozenset({4728, 4732, 4756})
+
+
+# Extractors take an event's StringInserts and return (user, source_ip, raw_message override)
+
+def _parse_user_ip(user_index: int, ip_index, strings):
+    source_ip = _insert(strings, ip_index, "N/A") if ip_index is not None else "N/A"
+    return _insert(strings, user_index), source_ip, None
+
+
+def _parse_4688(strings):
+    # Process Creation
+    # strings[5] is usually NewProcessName, strings[8] is CommandLine (if enabled)
+    proc_path = _insert(strings, 5)
+    cmd_line = _insert(strings, 8, "")
+    return _insert(strings, 1), "N/A", f"Process: {proc_path} {cmd_line}"
+
+
+def _parse_group(strings):
+    # Group member added; strings[6] is the actor
+    member = _insert(strings, 0)
+    group = _insert(strings, 2)
+    return _insert(strings, 6), "N/A", f"Member {member} added to group {group}"
+
+
+def _parse_service(strings):
+    # Service installed
+    svc_name = _insert(strings, 0)
+    img_path = _insert(strings, 1)
+    return "system", "N/A", f"Service Installed: {svc_name} ({img_path})"
+
+
+def _parse_audit(strings):
+    # Log cleared
+    return "audit-system", "N/A", None
+
+
+EVENT_EXTRACTORS = {
+    **{event_id: partial(_parse_user_ip, *indexes) for event_id, indexes in USER_IP_INDEXES.items()},
+    **dict.fromkeys(GROUP_EVENT_IDS, _parse_group),
+    4688: _parse_4688,
+    7045: _parse_service,
+    1102: _parse_audit,
+}
+
+# An event rendered through the Evt* API, with the PyEventLogRecord attributes parse_event reads
+RenderedEvent = namedtuple("RenderedEvent", ["EventID", "RecordNumber", "TimeGenerated", "StringInserts"])
+
+
 class WindowsAgent:
     """Collects Windows Security event logs."""
     
+    # Event handles fetched per EvtNext call
+    EVT_BATCH_SIZE = 512
+    
+    # Compress ingest bodies above this size; Security log text is highly repetitive
+    GZIP_MIN_BYTES = 4096
+    GZIP_LEVEL = 6
+    
+    # The collector (EvtSubscribe callback or polling loop) queues parsed events and a
+    # sender thread ships them in batches of up to MAX_SEND_EVENTS, at least every FLUSH_INTERVAL seconds
+    SEND_QUEUE_SIZE = 10000
+    MAX_SEND_EVENTS = 1000
+    FLUSH_INTERVAL = 2.0
+    RETRY_INTERVAL = 5.0
+    MAX_RETRY_INTERVAL = 120.0  # Retry delay doubles per consecutive failure up to this
+    
+    # Longest a polling cycle keeps reading when a backlog is waiting, in seconds
+    CYCLE_BUDGET = 30.0
+    
+    # Seconds between re-enumerating partitions and network interfaces for system status
+    TOPOLOGY_REFRESH = 300
+    
+    # A full status snapshot goes out when its stable fields change or after this many seconds;
+    # otherwise only STATUS_DELTA_FIELDS are posted to /system-status/delta
+    FULL_STATUS_INTERVAL = 600
+    STATUS_DELTA_FIELDS = ("source_host", "os_type", "cpu_usage", "memory_used", "memory_percent", "timestamp")
+    
     def __init__(self, api_url: str = "http://localhost:8000", api_key: str = "default-insecure-key-change-me"):
         self.api_url = api_url
         self.api_key = api_key
-        self.source_host = socket.gethostname()
+        self.source_host = sys.intern(socket.gethostname())
         self.os_type = "WINDOWS"
         self.event_log_server = "."  # Local machine
         self.event_log_name = "Security"
         
+        # Endpoint URLs, formatted once
+        self._ingest_url = f"{api_url}/ingest"
+        self._heartbeat_url = f"{api_url}/heartbeat"
+        self._status_url = f"{api_url}/system-status"
+        self._status_delta_url = f"{api_url}/system-status/delta"
+        self._health_url = f"{api_url}/health"
+        
+        # Persistent HTTP session so every call reuses pooled keep-alive connections
+        self.session = requests.Session()
+        self.session.headers.update({
+            "api-key": api_key,
+            "source-host": self.source_host,
+            "os-type": self.os_type
+        })
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=4,
+            max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[502, 503, 504])
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        
         # Event ID to severity mapping
         self.event_mapping = {
             4625: {"type": "LOGIN_FAIL", "severity": 3},      # Failed Logon
@@ -59,33 +188,107 @@ class WindowsAgent:
             1102: {"type": "LOG_TAMPERING", "severity": 5},   # Log Cleared
         }
         
+        # event_id -> (event_type, severity, extractor), so parse_event does a single lookup
+        self._handlers = {
+            event_id: (mapping["type"], mapping["severity"], EVENT_EXTRACTORS[event_id])
+            for event_id, mapping in self.event_mapping.items()
+        }
+        
+        # Every parsed event is a copy of this template, so the dict comes out pre-sized with
+        # its key hashes already computed and the constant fields already filled in
+        self._event_template = {
+            "event_id": None,
+            "timestamp": None,
+            "source_host": self.source_host,
+            "os_type": self.os_type,
+            "event_type": None,
+            "severity": None,
+            "source_ip": None,
+            "user": None,
+            "raw_message": None
+        }
+        
+        # XPath filter for the Evt* API, so Windows drops uninteresting event IDs before they reach Python
+        self._event_id_filter = " or ".join(f"EventID={event_id}" for event_id in self.event_mapping)
+        self._xpath = f"*[System[({self._event_id_filter})]]"
+        
         # State file to persist last processed record number
         # Use log directory if available, otherwise current directory
         log_dir = os.getenv("HEIMDALL_LOG_DIR", "C:\\Heimdall\\logs")
-        if not os.path.exists(log_dir):
-            os.makedirs(log_dir, exist_ok=True)
+        os.makedirs(log_dir, exist_ok=True)
         self.state_file = os.path.join(log_dir, "win_agent_state.json")
         self.last_record_number = self._load_state()
+        self._saved_record_number = self.last_record_number  # Value currently on disk
         self.pending_high_water_mark = None  # Track pending state update
+        
+        # Render contexts for the System properties and the EventData values, created once
+        self._system_context = None
+        self._user_context = None
+        if EVT_API_AVAILABLE:
+            self._system_context = win32evtlog.EvtCreateRenderContext(win32evtlog.EvtRenderContextSystem)
+            self._user_context = win32evtlog.EvtCreateRenderContext(win32evtlog.EvtRenderContextUser)
+        
+        # (record_number, event) pairs from the collector, drained by the sender thread
+        self._send_queue = queue.Queue(maxsize=self.SEND_QUEUE_SIZE)
+        self._stopping = threading.Event()
+        
+        # (last_record_number it was read after, events, high water mark) of the last
+        # collect_events batch, kept until sent so retries during an outage don't re-parse it
+        self._unsent_batch = None
+        
+        # Mount points and IPv4 interfaces for system status, re-enumerated every TOPOLOGY_REFRESH seconds
+        self._mountpoints = []
+        self._net_info = []
+        self._topology_time = None
+        
+        # Stable-field fingerprint and time of the last full status snapshot the server accepted
+        self._status_fingerprint = None
+        self._full_status_time = None
     
     def _load_state(self) -> int:
-        """Load the last processed record number from state file."""
+        """
+        Load the last processed record number from state file.
+        The file holds the bare number; older agents wrote {"last_record_number": N}.
+        """
         try:
-            if os.path.exists(self.state_file):
-                with open(self.state_file, 'r') as f:
-                    state = json.load(f)
-                    record_num = state.get("last_record_number", 0)
-                    print(f"[INFO] Loaded state: last_record_number = {record_num}")
-                    return record_num
-        except Exception as e:
+            with open(self.state_file, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return 0
+        except OSError as e:
             print(f"[WARN] Could not load state file: {e}")
-        return 0
+            return 0
+        
+        try:
+            record_num = int(data)
+        except ValueError:
+            try:
+                record_num = self._load_json(data).get("last_record_number", 0)
+            except Exception as e:
+                print(f"[WARN] Could not load state file: {e}")
+                return 0
+        
+        print(f"[INFO] Loaded state: last_record_number = {record_num}")
+        return record_num
 
     def _save_state(self):
-        """Save the last processed record number to state file."""
+        """
+        Save the last processed record number to state file as a bare integer.
+        Writes a temp file and renames it over the old one, so a crash mid-write
+        can never leave a truncated state file that replays the whole log.
+        """
+        if self.last_record_number == self._saved_record_number:
+            return
+        
+        tmp_file = self.state_file + ".tmp"
         try:
-            with open(self.state_file, 'w') as f:
-                json.dump({"last_record_number": self.last_record_number}, f)
+            fd = os.open(tmp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0))
+            try:
+                os.write(fd, str(self.last_record_number).encode())
+            finally:
+                os.close(fd)
+            os.replace(tmp_file, self.state_file)
+            self._saved_record_number = self.last_record_number
         except Exception as e:
             print(f"[ERROR] Could not save state file: {e}")
     
@@ -95,6 +298,7 @@ class WindowsAgent:
             self.last_record_number = self.pending_high_water_mark
             self._save_state()
             self.pending_high_water_mark = None
+            self._unsent_batch = None
 
     def get_event_log_handle(self):
         """Open the Security event log."""
@@ -105,99 +309,175 @@ class WindowsAgent:
             print(f"Error opening event log: {e}")
             return None
     
+    def _iter_records_legacy(self, after: int):
+        """
+        Yield PyEventLogRecords through the legacy ReadEventLog API: oldest first from the
+        record after `after`, or newest first when there is no saved position yet.
+        """
+        handle = self.get_event_log_handle()
+        if not handle:
+            return
+        
+        try:
+            if after:
+                oldest = win32evtlog.GetOldestEventLogRecord(handle)
+                newest = oldest + win32evtlog.GetNumberOfEventLogRecords(handle) - 1
+                if after >= newest:
+                    return
+                # Seek straight to the first unread record (or the oldest, if the log wrapped past it)
+                flags = win32evtlog.EVENTLOG_SEQUENTIAL_READ | win32evtlog.EVENTLOG_FORWARDS_READ
+                event_list = win32evtlog.ReadEventLog(
+                    handle,
+                    win32evtlog.EVENTLOG_SEEK_READ | win32evtlog.EVENTLOG_FORWARDS_READ,
+                    max(after + 1, oldest)
+                )
+            else:
+                flags = win32evtlog.EVENTLOG_SEQUENTIAL_READ | win32evtlog.EVENTLOG_BACKWARDS_READ
+                event_list = win32evtlog.ReadEventLog(handle, flags, 0)
+            
+            while event_list:
+                yield from event_list
+                event_list = win32evtlog.ReadEventLog(handle, flags, 0)
+        finally:
+            win32evtlog.CloseEventLog(handle)
+    
+    def _iter_records_evt(self, after: int):
+        """
+        Yield events through EvtQuery/EvtNext, rendered as values: oldest first after
+        record number `after`, or newest first when there is no saved position yet.
+        Windows skips message formatting and localization entirely on this path.
+        """
+        if after:
+            xpath = f"*[System[({self._event_id_filter}) and EventRecordID>{after}]]"
+            direction = win32evtlog.EvtQueryForwardDirection
+        else:
+            xpath = self._xpath
+            direction = win32evtlog.EvtQueryReverseDirection
+        
+        query = win32evtlog.EvtQuery(
+            self.event_log_name,
+            win32evtlog.EvtQueryChannelPath | direction,
+            Query=xpath
+        )
+        while True:
+            handles = win32evtlog.EvtNext(query, self.EVT_BATCH_SIZE)
+            if not handles:
+                return
+            for handle in handles:
+                yield self._render_event(handle)
+    
+    def _render_event(self, handle) -> RenderedEvent:
+        """Render an event handle's System properties and EventData values."""
+        system = win32evtlog.EvtRender(handle, win32evtlog.EvtRenderEventValues, Context=self._system_context)
+        user_data = win32evtlog.EvtRender(handle, win32evtlog.EvtRenderEventValues, Context=self._user_context)
+        
+        # TimeCreated is UTC; keep it naive like TimeGenerated so parse_event appends "Z"
+        created = system[win32evtlog.EvtSystemTimeCreated][0]
+        if created is not None and created.tzinfo is not None:
+            created = created.astimezone(timezone.utc).replace(tzinfo=None)
+        
+        return RenderedEvent(
+            system[win32evtlog.EvtSystemEventID][0],
+            system[win32evtlog.EvtSystemEventRecordId][0],
+            created,
+            [self._insert_text(value, value_type) for value, value_type in user_data]
+        )
+    
+    @staticmethod
+    def _insert_text(value, value_type) -> str:
+        """Format a rendered EventData value the way ReadEventLog's StringInserts show it."""
+        if value is None:
+            return "-"
+        if value_type == win32evtlog.EvtVarTypeSid:
+            return win32security.ConvertSidToStringSid(value)
+        if value_type in (win32evtlog.EvtVarTypeHexInt32, win32evtlog.EvtVarTypeHexInt64):
+            return hex(value)
+        return str(value)
+    
     def parse_event(self, event) -> dict:
         """
         Parse a Windows event and extract relevant information.
         Returns None if the event is not interesting.
-        PyEventLogRecord objects have attributes, not dict keys.
+        PyEventLogRecord objects (and RenderedEvents) have attributes, not dict keys.
         """
         try:
             # Access object attributes, not dict keys
             event_id = event.EventID
             record_number = event.RecordNumber
             
-            # Check if this is an event we care about
-            if event_id not in self.event_mapping:
+            # Check if this is an event we care about. The Evt* API already filters by
+            # self._xpath, so a hit is the common case and a single subscript is cheapest;
+            # legacy ReadEventLog records still arrive unfiltered and miss here
+            try:
+                event_type, severity, extractor = self._handlers[event_id]
+            except KeyError:
                 return None
             
-            mapping = self.event_mapping[event_id]
-            event_type = mapping["type"]
-            severity = mapping["severity"]
-            
             # Extract data from event strings
             strings = event.StringInserts if hasattr(event, 'StringInserts') and event.StringInserts else []
-            raw_message = " | ".join(str(s) for s in strings) if strings else f"Event ID {event_id}"
             
             # Try to extract username and IP
-            user = "system"
-            source_ip = "N/A"
+            user, source_ip, raw_message = extractor(strings)
+            if raw_message is None:
+                raw_message = " | ".join(str(s) for s in strings) if strings else f"Event ID {event_id}"
             
-            if event_id == 4625:
-                # Failed logon
-                user = str(strings[5]) if len(strings) > 5 else "unknown"
-                source_ip = str(strings[19]) if len(strings) > 19 else "N/A"
-            elif event_id == 4624:
-                # Successful logon
-                user = str(strings[5]) if len(strings) > 5 else "unknown"
-                source_ip = str(strings[18]) if len(strings) > 18 else "N/A"
-                # Filter out noisy system logons (Logon Type 5, 0, etc) if needed
-                # For now, we ingest but severity is 1 (Info)
-            elif event_id == 4688:
-                # Process Creation
-                # strings[5] is usually NewProcessName, strings[8] is CommandLine (if enabled)
-                user = str(strings[1]) if len(strings) > 1 else "unknown"
-                proc_path = str(strings[5]) if len(strings) > 5 else "unknown"
-                cmd_line = str(strings[8]) if len(strings) > 8 else ""
-                raw_message = f"Process: {proc_path} {cmd_line}"
-            elif event_id == 4720:
-                # User created
-                user = str(strings[0]) if len(strings) > 0 else "unknown"
-            elif event_id == 4726:
-                # User deleted
-                user = str(strings[0]) if len(strings) > 0 else "unknown"
-            elif event_id in [4728, 4732, 4756]:
-                # Group member added
-                member = str(strings[0]) if len(strings) > 0 else "unknown"
-                group = str(strings[2]) if len(strings) > 2 else "unknown"
-                raw_message = f"Member {member} added to group {group}"
-                user = str(strings[6]) if len(strings) > 6 else "unknown" # Actor
-            elif event_id == 7045:
-                # Service installed
-                svc_name = str(strings[0]) if len(strings) > 0 else "unknown"
-                img_path = str(strings[1]) if len(strings) > 1 else "unknown"
-                raw_message = f"Service Installed: {svc_name} ({img_path})"
-            elif event_id == 1102:
-                user = "audit-system"
-            
-            # Handle timestamp
-            try:
-                if hasattr(event, 'TimeGenerated') and event.TimeGenerated:
-                    timestamp = event.TimeGenerated.isoformat() + "Z"
-                else:
-                    timestamp = datetime.utcnow().isoformat() + "Z"
-            except:
-                timestamp = datetime.utcnow().isoformat() + "Z"
+            # Handle timestamp; the clock is only read for the rare event without one
+            time_generated = event.TimeGenerated
+            if time_generated:
+                timestamp = time_generated.isoformat() + "Z"
+            else:
+                timestamp = datetime.now(timezone.utc).replace(tzinfo=None).isoformat() + "Z"
             
             # Deterministic Event ID to prevent duplicates
             # Format: HOST-EVENTID-RECORDNUMBER
             unique_id = f"{self.source_host}-{event_id}-{record_number}"
             
-            return {
-                "event_id": unique_id,
-                "timestamp": timestamp,
-                "source_host": self.source_host,
-                "os_type": self.os_type,
-                "event_type": event_type,
-                "severity": severity,
-                "source_ip": source_ip,
-                "user": user,
-                "raw_message": raw_message,
-                "record_number": record_number  # Keep for tracking
-            }
+            parsed = self._event_template.copy()
+            parsed["event_id"] = unique_id
+            parsed["timestamp"] = timestamp
+            parsed["event_type"] = event_type
+            parsed["severity"] = severity
+            parsed["source_ip"] = source_ip
+            parsed["user"] = user
+            parsed["raw_message"] = raw_message
+            return parsed
         except Exception as e:
             print(f"    Error parsing event: {e}")
             return None
     
+    def _read_new_events(self, after: int, max_events: int) -> tuple[list, int]:
+        """
+        Read up to max_events interesting events with record numbers above `after`.
+        Returns (record_number, event) pairs, oldest first, and the highest record number read.
+        Reading resumes forward from `after`; with no position yet, the newest events are taken.
+        """
+        # Heartbeat-only mode without pywin32
+        if not WIN32_AVAILABLE:
+            return [], after
+        
+        records = self._iter_records_evt(after) if EVT_API_AVAILABLE else self._iter_records_legacy(after)
+        items = []
+        high_water_mark = after
+        
+        try:
+            for event in records:
+                if len(items) >= max_events:
+                    break
+                
+                # Track the highest record number we see in this session
+                if event.RecordNumber > high_water_mark:
+                    high_water_mark = event.RecordNumber
+                
+                parsed = self.parse_event(event)
+                if parsed:
+                    items.append((event.RecordNumber, parsed))
+        finally:
+            records.close()
+        
+        if not after:
+            items.reverse()
+        return items, high_water_mark
+    
     def collect_events(self, max_events: int = 1000) -> list[dict]:
         """
         Collect recent events from the Windows Security log.
@@ -210,58 +490,30 @@ class WindowsAgent:
         if not WIN32_AVAILABLE:
             return events
         
+        # The previous batch was never sent: hand it out again instead of re-reading and re-parsing it
+        if self._unsent_batch is not None and self._unsent_batch[0] == self.last_record_number:
+            _, events, self.pending_high_water_mark = self._unsent_batch
+            return list(events)
+        
         try:
-            handle = self.get_event_log_handle()
-            if not handle:
-                return events
-            
-            total_read = 0
-            batch_num = 0
-            new_high_water_mark = self.last_record_number
-            stop_reading = False
-            
-            # Keep reading in batches until we have enough events or hit old ones
-            while len(events) < max_events and not stop_reading:
-                batch_num += 1
-                event_list = win32evtlog.ReadEventLog(
-                    handle,
-                    win32evtlog.EVENTLOG_BACKWARDS_READ | win32evtlog.EVENTLOG_SEQUENTIAL_READ,
-                    0
-                )
-                
-                if not event_list:
-                    break
-                
-                total_read += len(event_list)
-                
-                for i, event in enumerate(event_list):
-                    if len(events) >= max_events:
-                        break
-                    
-                    # Check if we've seen this record before
-                    if event.RecordNumber <= self.last_record_number:
-                        stop_reading = True
-                        break
-                    
-                    # Track the highest record number we see in this session
-                    if event.RecordNumber > new_high_water_mark:
-                        new_high_water_mark = event.RecordNumber
-                    
-                    parsed = self.parse_event(event)
-                    if parsed:
-                        # Remove internal field before sending if desired, but it's harmless
-                        if "record_number" in parsed:
-                            del parsed["record_number"]
-                        events.append(parsed)
-            
-            win32evtlog.CloseEventLog(handle)
+            items, new_high_water_mark = self._read_new_events(self.last_record_number, max_events)
+            events = [event for _, event in items]
             
             # Store the new high water mark but don't save state yet
             # State will only be saved after successful send to prevent losing events
-            if new_high_water_mark > self.last_record_number:
+            if new_high_water_mark > self.last_record_number and not events:
+                # Only unmonitored records were read: nothing can be lost, so move past them now.
+                # An empty batch is never cached, or later cycles would keep handing it out.
+                self.last_record_number = new_high_water_mark
+                self._save_state()
+                self.pending_high_water_mark = None
+                self._unsent_batch = None
+            elif new_high_water_mark > self.last_record_number:
                 self.pending_high_water_mark = new_high_water_mark
+                self._unsent_batch = (self.last_record_number, events, new_high_water_mark)
             else:
                 self.pending_high_water_mark = None
+                self._unsent_batch = None
         
         except Exception as e:
             print(f"[ERROR] Error collecting events: {e}")
@@ -270,6 +522,123 @@ class WindowsAgent:
         
         return events
     
+    @staticmethod
+    def _dump_json(payload: dict) -> bytes:
+        """Serialize a payload, with orjson when available. datetimes become ISO 8601 strings."""
+        if HAVE_ORJSON:
+            return orjson.dumps(payload)
+        return json.dumps(payload, default=datetime.isoformat).encode()
+    
+    @staticmethod
+    def _load_json(data: bytes):
+        """Parse JSON bytes, with orjson when available."""
+        return orjson.loads(data) if HAVE_ORJSON else json.loads(data)
+    
+    def _create_bookmark(self):
+        """Bookmark at last_record_number, so a subscription resumes right after it."""
+        bookmark_xml = (
+            f"<BookmarkList><Bookmark Channel='{self.event_log_name}' "
+            f"RecordId='{self.last_record_number}' IsCurrent='true'/></BookmarkList>"
+        )
+        return win32evtlog.EvtCreateBookmark(bookmark_xml)
+    
+    def _subscribe(self):
+        """
+        Subscribe to the event log with _on_event as the push callback.
+        Resumes after the saved record number, or starts with future events on a fresh state.
+        """
+        if self.last_record_number:
+            flags = win32evtlog.EvtSubscribeStartAfterBookmark
+            bookmark = self._create_bookmark()
+        else:
+            flags = win32evtlog.EvtSubscribeToFutureEvents
+            bookmark = None
+        
+        return win32evtlog.EvtSubscribe(
+            self.event_log_name,
+            flags,
+            Callback=self._on_event,
+            Query=self._xpath,
+            Bookmark=bookmark
+        )
+    
+    def _on_event(self, action, context, event):
+        """EvtSubscribe callback: parse each delivered event and queue the interesting ones."""
+        if action != win32evtlog.EvtSubscribeActionDeliver:
+            # On errors Windows passes the error code instead of an event handle
+            print(f"[WARN] Event subscription error: {event}")
+            return
+        
+        try:
+            record = self._render_event(event)
+        except Exception as e:
+            print(f"    Error rendering event: {e}")
+            return
+        
+        parsed = self.parse_event(record)
+        if parsed:
+            self._enqueue((record.RecordNumber, parsed))
+    
+    def _enqueue(self, item: tuple):
+        """Queue an event for the sender, blocking rather than dropping when it falls behind."""
+        # The event log still holds anything not yet queued, so waiting loses nothing
+        while not self._stopping.is_set():
+            try:
+                self._send_queue.put(item, timeout=1)
+                return
+            except queue.Full:
+                continue
+    
+    def _send_batch(self, batch: list) -> bool:
+        """Send queued (record_number, event) pairs; state advances to the newest on success."""
+        self.pending_high_water_mark = max(record_number for record_number, _ in batch)
+        return self.send_events([event for _, event in batch])
+    
+    def _send_loop(self, heartbeat_interval: int):
+        """
+        Sender thread: gather queued events for up to FLUSH_INTERVAL seconds and send them.
+        A failed batch is kept and retried with exponential backoff, so an outage costs neither
+        re-parsing nor a steady stream of doomed posts. A heartbeat goes out when nothing was sent
+        for a while.
+        """
+        batch = []
+        last_sent = time.monotonic()
+        failures = 0
+        
+        while not self._stopping.is_set():
+            flush_at = time.monotonic() + self.FLUSH_INTERVAL
+            while len(batch) < self.MAX_SEND_EVENTS:
+                remaining = flush_at - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._send_queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            
+            if batch:
+                if self._send_batch(batch):
+                    batch = []
+                    last_sent = time.monotonic()
+                    failures = 0
+                else:
+                    failures += 1
+                    delay = min(self.RETRY_INTERVAL * 2 ** (failures - 1), self.MAX_RETRY_INTERVAL)
+                    print(f"  [WARN] Failed to send events - retrying in {delay:.0f}s")
+                    self._stopping.wait(delay)
+            elif time.monotonic() - last_sent >= heartbeat_interval:
+                self.send_heartbeat()
+                last_sent = time.monotonic()
+        
+        # Final flush of whatever is still queued
+        while True:
+            try:
+                batch.append(self._send_queue.get_nowait())
+            except queue.Empty:
+                break
+        if batch:
+            self._send_batch(batch)
+    
     def send_events(self, events: list[dict]) -> bool:
         """Send events to the central API."""
         if not events:
@@ -277,12 +646,16 @@ class WindowsAgent:
             return self.send_heartbeat()
         
         try:
-            headers = {"api-key": self.api_key}
-            payload = {"events": events}
+            body = self._dump_json({"events": events})
+            
+            headers = {"content-type": "application/json"}
+            if len(body) > self.GZIP_MIN_BYTES:
+                body = gzip.compress(body, compresslevel=self.GZIP_LEVEL)
+                headers["content-encoding"] = "gzip"
             
-            response = requests.post(
-                f"{self.api_url}/ingest",
-                json=payload,
+            response = self.session.post(
+                self._ingest_url,
+                data=body,
                 headers=headers,
                 timeout=30  # Increased timeout for slow servers
             )
@@ -315,15 +688,9 @@ class WindowsAgent:
     def send_heartbeat(self) -> bool:
         """Send a heartbeat to keep agent marked as active on dashboard."""
         try:
-            headers = {
-                "api-key": self.api_key,
-                "source-host": self.source_host,
-                "os-type": self.os_type
-            }
-            
-            response = requests.post(
-                f"{self.api_url}/heartbeat",
-                headers=headers,
+            # api-key, source-host and os-type headers come from the session
+            response = self.session.post(
+                self._heartbeat_url,
                 timeout=30  # Increased timeout for slow servers
             )
             
@@ -338,6 +705,39 @@ class WindowsAgent:
             print(f"[WARN] Heartbeat error: {e}")
             return False
     
+    def _refresh_topology(self):
+        """
+        Re-enumerate disk partitions and IPv4 addresses. Both go through WMI/registry
+        queries on Windows and rarely change, so they are cached between status snapshots.
+        """
+        mountpoints = []
+        try:
+            for part in psutil.disk_partitions(all=False):
+                # Skip CD-ROMs or unready devices
+                if 'cdrom' in part.opts or part.fstype == '':
+                    continue
+                mountpoints.append(part.mountpoint)
+        except Exception as e:
+            print(f"[WARN] Error collecting disk info: {e}")
+        
+        net_info = []
+        try:
+            interfaces = psutil.net_if_addrs()
+            for iface, addrs in interfaces.items():
+                for addr in addrs:
+                    if addr.family == socket.AF_INET:  # IPv4 only
+                        net_info.append({
+                            "interface": iface,
+                            "ip": addr.address,
+                            "mac": "N/A"
+                        })
+        except Exception as e:
+            print(f"[WARN] Error collecting network info: {e}")
+        
+        self._mountpoints = mountpoints
+        self._net_info = net_info
+        self._topology_time = time.monotonic()
+    
     def collect_system_status(self) -> dict:
         """Collect detailed system status using psutil."""
         try:
@@ -348,55 +748,51 @@ class WindowsAgent:
             # Memory
             mem = psutil.virtual_memory()
             
-            # Disk (Iterate mounted partitions)
+            if self._topology_time is None or time.monotonic() - self._topology_time > self.TOPOLOGY_REFRESH:
+                self._refresh_topology()
+            
+            # Disk (usage of each cached mount point)
             disk_info = []
-            try:
-                for part in psutil.disk_partitions(all=False):
-                    # Skip CD-ROMs or unready devices
-                    if 'cdrom' in part.opts or part.fstype == '':
-                        continue
-                    
-                    try:
-                        usage = psutil.disk_usage(part.mountpoint)
-                        disk_info.append({
-                            "mount": part.mountpoint,
-                            "total": usage.total,
-                            "used": usage.used,
-                            "free": usage.free,
-                            "percent": usage.percent
-                        })
-                    except Exception:
-                        # Device likely not ready
-                        continue
-            except Exception as e:
-                print(f"[WARN] Error collecting disk info: {e}")
+            for mountpoint in self._mountpoints:
+                try:
+                    usage = psutil.disk_usage(mountpoint)
+                    disk_info.append({
+                        "mount": mountpoint,
+                        "total": usage.total,
+                        "used": usage.used,
+                        "free": usage.free,
+                        "percent": usage.percent
+                    })
+                except Exception:
+                    # Device likely not ready
+                    continue
             
-            # Network
-            net_info = []
-            try:
-                interfaces = psutil.net_if_addrs()
-                for iface, addrs in interfaces.items():
-                    for addr in addrs:
-                        if addr.family == socket.AF_INET:  # IPv4 only
-                            net_info.append({
-                                "interface": iface,
-                                "ip": addr.address,
-                                "mac": "N/A"
-                            })
-            except Exception as e:
-                print(f"[WARN] Error collecting network info: {e}")
+            # Network (cached interface addresses)
+            net_info = self._net_info
             
-            # Processes (Top 10 by CPU)
+            # Processes (Top 10 by CPU) - nlargest keeps a 10-entry heap instead of sorting every process.
+            # process_iter reuses its Process objects between calls, so cpu_percent is a real delta
+            # after the first snapshot. Only cpu_percent is read for every process; the username
+            # lookup (a token query plus a SID lookup on Windows) is done for the 10 winners only.
             top_procs = []
             try:
-                for proc in sorted(psutil.process_iter(['pid', 'name', 'username', 'cpu_percent', 'memory_percent']), 
-                                key=lambda p: p.info['cpu_percent'], reverse=True)[:10]:
-                    top_procs.append(proc.info)
+                top = heapq.nlargest(
+                    10,
+                    psutil.process_iter(['cpu_percent']),
+                    key=lambda p: p.info['cpu_percent'] or 0
+                )
+                for proc in top:
+                    try:
+                        info = proc.as_dict(attrs=['pid', 'name', 'username', 'memory_percent'])
+                    except psutil.NoSuchProcess:
+                        continue
+                    info['cpu_percent'] = proc.info['cpu_percent']
+                    top_procs.append(info)
             except Exception as e:
                 print(f"Error getting processes: {e}")
             
-            # Boot Time
-            boot_time = datetime.fromtimestamp(psutil.boot_time()).isoformat()
+            # Boot Time (datetimes are serialized by _dump_json)
+            boot_time = datetime.fromtimestamp(psutil.boot_time())
             
             return {
                 "source_host": self.source_host,
@@ -411,7 +807,7 @@ class WindowsAgent:
                 "network_info": net_info,
                 "top_processes": top_procs,
                 "boot_time": boot_time,
-                "timestamp": datetime.utcnow().isoformat() + "Z"
+                "timestamp": datetime.now(timezone.utc)
             }
         except Exception as e:
             print(f"[ERROR] Collecting system status: {e}")
@@ -424,41 +820,56 @@ class WindowsAgent:
             if not status_data:
                 return False
                 
-            headers = {"api-key": self.api_key}
-            payload = {"status": status_data}
+            # Disk sizes, interfaces, boot time and OS details only change on reconfiguration or reboot
+            fingerprint = hash((
+                status_data["os_details"],
+                status_data["cpu_count"],
+                status_data["memory_total"],
+                tuple((disk["mount"], disk["total"]) for disk in status_data["disk_info"]),
+                tuple((net["interface"], net["ip"]) for net in status_data["network_info"]),
+                status_data["boot_time"]
+            ))
+            now = time.monotonic()
+            full = (
+                fingerprint != self._status_fingerprint
+                or now - self._full_status_time >= self.FULL_STATUS_INTERVAL
+            )
             
-            response = requests.post(
-                f"{self.api_url}/system-status",
-                json=payload,
-                headers=headers,
+            if full:
+                url = self._status_url
+                body = self._dump_json({"status": status_data})
+            else:
+                url = self._status_delta_url
+                body = self._dump_json({"status_delta": {field: status_data[field] for field in self.STATUS_DELTA_FIELDS}})
+            
+            response = self.session.post(
+                url,
+                data=body,
+                headers={"content-type": "application/json"},
                 timeout=10
             )
             
             if response.status_code == 200:
-                print(f"[INFO] System status sent to {self.api_url}")
+                if full:
+                    self._status_fingerprint = fingerprint
+                    self._full_status_time = now
+                print(f"[INFO] System status {'sent' if full else 'update sent'} to {self.api_url}")
                 return True
             else:
                 print(f"[WARN] Failed to send system status: {response.status_code} - {response.text}")
+                # Start over with a full snapshot (the server may not have one for this host)
+                self._status_fingerprint = None
                 return False
         except Exception as e:
             print(f"[ERROR] Sending system status: {e}")
             return False
 
-    def run(self, interval: int = 60):
-        """
-        Main agent loop.
-        Collect events and send them to the API at regular intervals.
-        """
-        print(f"Windows Agent starting (host: {self.source_host})")
-        print(f"API URL: {self.api_url}")
-        print(f"API Key: {'*' * (len(self.api_key) - 8)}{self.api_key[-8:] if len(self.api_key) > 8 else '***'}")
-        
-        # Test connection on startup
+    def _check_connection(self):
+        """Probe /health once and report whether the API is reachable and accepts the key."""
         print("\nTesting API connection...")
         try:
-            test_response = requests.get(
-                f"{self.api_url}/health",
-                headers={"api-key": self.api_key},
+            test_response = self.session.get(
+                self._health_url,
                 timeout=10
             )
             if test_response.status_code == 200:
@@ -478,38 +889,108 @@ class WindowsAgent:
             print(f"[ERROR] Connection timeout - server may be unreachable")
         except Exception as e:
             print(f"[ERROR] Connection test failed: {e}")
+    
+    def run(self, interval: int = 60):
+        """
+        Main agent loop.
+        Collect events and send them to the API at regular intervals.
+        """
+        print(f"Windows Agent starting (host: {self.source_host})")
+        print(f"API URL: {self.api_url}")
+        print(f"API Key: {'*' * (len(self.api_key) - 8)}{self.api_key[-8:] if len(self.api_key) > 8 else '***'}")
         
-        print(f"\nStarting event collection loop (interval: {interval}s)...\n")
+        # Test connection on startup in the background; collection doesn't depend on its result
+        threading.Thread(target=self._check_connection, name="heimdall-health", daemon=True).start()
         
-        loop_count = 0
-        while True:
-            try:
-                loop_count += 1
-                print(f"[Loop {loop_count}] Collecting events...")
-                
-                events = self.collect_events(max_events=1000)
-                print(f"  Found {len(events)} events to process")
-                
-                # Always send (either events or heartbeat)
-                success = self.send_events(events)
-                if not success and events:
-                    print(f"  [WARN] Failed to send events - will retry on next cycle")
-                
+        if EVT_API_AVAILABLE:
+            self._run_subscription(interval)
+        else:
+            self._run_polling(interval)
+    
+    def _run_subscription(self, interval: int):
+        """Ship events as Windows pushes them; the main thread only sends system status."""
+        # On a fresh state, ship the newest events first so the subscription has a position to resume from
+        if not self.last_record_number:
+            self.send_events(self.collect_events(max_events=self.MAX_SEND_EVENTS))
+        
+        try:
+            subscription = self._subscribe()
+        except Exception as e:
+            print(f"[ERROR] Event subscription failed: {e}")
+            print(f"  Falling back to polling every {interval}s")
+            self._run_polling(interval)
+            return
+        print(f"\nSubscribed to {self.event_log_name} events (status interval: {interval}s)...\n")
+        
+        sender = threading.Thread(target=self._send_loop, args=(interval,), name="heimdall-sender", daemon=True)
+        sender.start()
+        
+        try:
+            while True:
                 # Send System Status (RMM)
                 self.send_system_status()
-                
-                print(f"  Sleeping for {interval} seconds...\n")
-                time.sleep(interval)
-            
-            except KeyboardInterrupt:
-                print("\nAgent stopped by user")
-                break
-            except Exception as e:
-                print(f"[ERROR] Unexpected error in main loop: {e}")
-                import traceback
-                traceback.print_exc()
-                print(f"  Sleeping for {interval} seconds before retry...\n")
                 time.sleep(interval)
+        except KeyboardInterrupt:
+            print("\nAgent stopped by user")
+        finally:
+            subscription.Close()
+            self._stopping.set()
+            sender.join(timeout=30)
+    
+    def _run_polling(self, interval: int):
+        """
+        Read new events every interval seconds and hand them to the sender thread,
+        so a slow API never holds up collection.
+        """
+        print(f"\nStarting event collection loop (interval: {interval}s)...\n")
+        
+        sender = threading.Thread(target=self._send_loop, args=(interval,), name="heimdall-sender", daemon=True)
+        sender.start()
+        
+        # Highest record number already queued; the state file only advances once the sender succeeds
+        position = self.last_record_number
+        
+        loop_count = 0
+        try:
+            while True:
+                try:
+                    loop_count += 1
+                    print(f"[Loop {loop_count}] Collecting events...")
+                    
+                    # Keep reading full batches until the log is drained or the cycle budget is spent;
+                    # the bounded queue holds the reader back if the sender falls behind
+                    deadline = time.monotonic() + self.CYCLE_BUDGET
+                    found = 0
+                    while True:
+                        items, position = self._read_new_events(position, self.MAX_SEND_EVENTS)
+                        found += len(items)
+                        
+                        # Items come oldest first, so each successful batch moves the state forward
+                        for item in items:
+                            self._enqueue(item)
+                        
+                        if len(items) < self.MAX_SEND_EVENTS or time.monotonic() >= deadline:
+                            break
+                    print(f"  Found {found} events to process")
+                    
+                    # Send System Status (RMM)
+                    self.send_system_status()
+                    
+                    print(f"  Sleeping for {interval} seconds...\n")
+                    time.sleep(interval)
+                
+                except KeyboardInterrupt:
+                    print("\nAgent stopped by user")
+                    break
+                except Exception as e:
+                    print(f"[ERROR] Unexpected error in main loop: {e}")
+                    import traceback
+                    traceback.print_exc()
+                    print(f"  Sleeping for {interval} seconds before retry...\n")
+                    time.sleep(interval)
+        finally:
+            self._stopping.set()
+            sender.join(timeout=30)
 
 
 def main():
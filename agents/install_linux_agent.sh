@@ -65,7 +65,7 @@ fi
 # 4. Install Python Dependencies
 echo "Installing Python libraries..."
 "$INSTALL_DIR/venv/bin/pip" install --upgrade pip
-"$INSTALL_DIR/venv/bin/pip" install requests python-dateutil psutil
+"$INSTALL_DIR/venv/bin/pip" install requests python-dateutil psutil watchdog
 
 # 5. Copy Agent Script
 # Assumes agent_linux.py is in the same directory as this script
@@ -46,11 +46,12 @@ except Exception as e:
     sys.exit(1)
 print()
 
-# Test 3: DNS Resolution
+# Test 3: DNS Resolution (one getaddrinfo lookup, IPv4 and IPv6, reused by Test 4)
 print("3. Testing DNS Resolution...")
 try:
-    ip_address = socket.gethostbyname(host)
-    print(f"   ✓ Resolved {host} to {ip_address}")
+    addr_infos = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    addresses = ", ".join(dict.fromkeys(info[4][0] for info in addr_infos))
+    print(f"   ✓ Resolved {host} to {addresses}")
 except socket.gaierror as e:
     print(f"   ✗ DNS resolution failed: {e}")
     print("   → Check network connectivity and DNS settings")
@@ -63,12 +64,17 @@ print()
 # Test 4: Port Connectivity
 print("4. Testing Port Connectivity...")
 try:
-    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    sock.settimeout(5)
-    result = sock.connect_ex((host, port))
-    sock.close()
+    # Try each resolved address until one accepts the connection
+    result = None
+    for family, sock_type, proto, _, sockaddr in addr_infos:
+        sock = socket.socket(family, sock_type, proto)
+        sock.settimeout(5)
+        result = sock.connect_ex(sockaddr)
+        sock.close()
+        if result == 0:
+            break
     if result == 0:
-        print(f"   ✓ Port {port} is reachable")
+        print(f"   ✓ Port {port} is reachable at {sockaddr[0]}")
     else:
         print(f"   ✗ Port {port} is not reachable (error code: {result})")
         print("   → Check firewall rules and network connectivity")
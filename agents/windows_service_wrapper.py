@@ -1,8 +1,11 @@
 import sys
 import os
+import time
 import logging
 from pathlib import Path
 
+import requests
+
 log_dir = Path(os.getenv("HEIMDALL_LOG_DIR", "C:\\Heimdall\\logs"))
 log_dir.mkdir(parents=True, exist_ok=True)
 log_file = log_dir / "heimdall-agent.log"
@@ -20,6 +23,7 @@ logger = logging.getLogger(__name__)
 try:
     import win32serviceutil
     import win32service
+    import win32event
     import servicemanager
     import win32timezone  # Required by win32serviceutil.HandleCommandLine
 except ImportError as e:
@@ -40,10 +44,14 @@ class HeimdallWindowsService(win32serviceutil.ServiceFramework):
         win32serviceutil.ServiceFramework.__init__(self, args)
         self.is_alive = True
         self.agent = None
+        # Signaled by SvcStop so the main loop wakes immediately instead of polling is_alive
+        self.hWaitStop = win32event.CreateEvent(None, 0, 0, None)
 
     def SvcStop(self):
         logger.info("Service stop requested")
+        self.ReportServiceStatus(win32service.SERVICE_STOP_PENDING)
         self.is_alive = False
+        win32event.SetEvent(self.hWaitStop)
 
     def SvcDoRun(self):
         logger.info("Heimdall Windows Agent Service starting")
@@ -60,11 +68,10 @@ class HeimdallWindowsService(win32serviceutil.ServiceFramework):
             
             # Test API connection on startup
             try:
-                import requests
                 logger.info("Testing API connection...")
-                test_response = requests.get(
+                # Reuse the agent's pooled session (it already carries the api-key header)
+                test_response = self.agent.session.get(
                     f"{api_url}/health",
-                    headers={"api-key": api_key},
                     timeout=10
                 )
                 if test_response.status_code == 200:
@@ -87,35 +94,41 @@ class HeimdallWindowsService(win32serviceutil.ServiceFramework):
                     loop_count += 1
                     logger.info("Loop " + str(loop_count) + " collecting events...")
 
-                    events = self.agent.collect_events(max_events=1000)
-                    logger.info("Found " + str(len(events)) + " events to send")
-
-                    success = self.agent.send_events(events)
-                    if success:
-                        if events:
-                            logger.info("Successfully sent " + str(len(events)) + " events to " + api_url)
+                    # Drain a backlog in full batches, each advancing the saved state on success,
+                    # until the log is caught up, a send fails, or the cycle budget is spent
+                    deadline = time.monotonic() + self.agent.CYCLE_BUDGET
+                    while self.is_alive:
+                        events = self.agent.collect_events(max_events=self.agent.MAX_SEND_EVENTS)
+                        logger.info("Found " + str(len(events)) + " events to send")
+
+                        success = self.agent.send_events(events)
+                        if success:
+                            if events:
+                                logger.info("Successfully sent " + str(len(events)) + " events to " + api_url)
+                            else:
+                                logger.info("Sent heartbeat to " + api_url)
                         else:
-                            logger.info("Sent heartbeat to " + api_url)
-                    else:
-                        if events:
-                            logger.warning("Failed to send " + str(len(events)) + " events to " + api_url + " - will retry on next cycle")
-                            logger.warning("Events will be retried to prevent data loss")
-                        else:
-                            logger.warning("Failed to send heartbeat to " + api_url + " - server may be slow or unreachable")
+                            if events:
+                                logger.warning("Failed to send " + str(len(events)) + " events to " + api_url + " - will retry on next cycle")
+                                logger.warning("Events will be retried to prevent data loss")
+                            else:
+                                logger.warning("Failed to send heartbeat to " + api_url + " - server may be slow or unreachable")
+
+                        if not success or len(events) < self.agent.MAX_SEND_EVENTS or time.monotonic() >= deadline:
+                            break
 
                     if not self.is_alive:
                         break
 
-                    for _ in range(interval):
-                        if not self.is_alive:
-                            break
-                        import time
-                        time.sleep(1)
+                    # Sleep until the next cycle, waking at once if the service is stopped
+                    rc = win32event.WaitForSingleObject(self.hWaitStop, interval * 1000)
+                    if rc == win32event.WAIT_OBJECT_0:
+                        break
 
                 except Exception as e:
                     logger.error("Error in main loop: " + str(e), exc_info=True)
-                    import time
-                    time.sleep(interval)
+                    if win32event.WaitForSingleObject(self.hWaitStop, interval * 1000) == win32event.WAIT_OBJECT_0:
+                        break
 
         except Exception as e:
             logger.error("Service error: " + str(e), exc_info=True)
@@ -136,7 +149,6 @@ if __name__ == '__main__':
                 # After install, set service to auto-start
                 if cmd == "install":
                     try:
-                        import time
                         time.sleep(1)  # Give Windows time to register the service
                         scm = win32service.OpenSCManager(None, None, win32service.SC_MANAGER_ALL_ACCESS)
                         try:
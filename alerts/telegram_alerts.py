@@ -9,12 +9,65 @@ Instant notification system - keeping you informed when Heimdall detects threats
 
 import os
 import requests
+from requests.adapters import HTTPAdapter
 import logging
+from collections import defaultdict
 from datetime import datetime
 from typing import Optional, List, Dict
 
 logger = logging.getLogger(__name__)
 
+# Message templates, built once and filled with format_map/format per alert
+_CRITICAL_TMPL = """
+🚨 <b>CRITICAL SECURITY ALERT</b>
+
+<b>Type:</b> {event_type}
+<b>Severity:</b> {severity}/5
+<b>Host:</b> {source_host}
+<b>User:</b> {user}
+<b>Source IP:</b> {source_ip}
+<b>Time:</b> {timestamp}
+
+<b>Details:</b>
+<code>{details}</code>
+
+ID: {short_id}...
+"""
+
+# Values shown when a critical event lacks a field (anything else falls back to "N/A")
+_CRITICAL_DEFAULTS = {
+    "source_host": "unknown",
+    "event_type": "UNKNOWN",
+    "severity": 0,
+    "user": "system",
+    "raw_message": "",
+}
+
+_METRICS_TMPL = """
+📊 <b>Mini-SIEM Daily Report</b>
+
+<b>24-Hour Summary:</b>
+  Total Alerts: {total_alerts}
+
+<b>Threats by OS:</b>
+{os_summary}
+
+<b>Top Attacking IPs:</b>
+{ips_summary}
+
+<b>Most Blocked Domain:</b> {most_blocked_domain}
+
+Time: {time}
+"""
+
+_AGENT_STATUS_TMPL = """
+{indicator} <b>Agent Status: {agent_name}</b>
+
+<b>Status:</b> {status}
+{last_seen_line}
+<b>Updated:</b> {time}
+"""
+
 
 class TelegramAlert:
     """Send alerts via Telegram bot."""
@@ -31,6 +84,12 @@ class TelegramAlert:
         self.chat_id = chat_id or os.getenv("TELEGRAM_CHAT_ID")
         self.api_url = "https://api.telegram.org"
         self.enabled = bool(self.bot_token and self.chat_id)
+        self._send_url = f"{self.api_url}/bot{self.bot_token}/sendMessage"
+        self._base_payload = {"chat_id": self.chat_id, "disable_web_page_preview": True}
+        
+        # Pooled keep-alive session, so alerts after the first skip the TCP and TLS handshakes
+        self._session = requests.Session()
+        self._session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=10))
         
         if not self.enabled:
             logger.warning("Telegram alerting disabled (missing BOT_TOKEN or CHAT_ID)")
@@ -50,15 +109,9 @@ class TelegramAlert:
             return False
         
         try:
-            url = f"{self.api_url}/bot{self.bot_token}/sendMessage"
-            payload = {
-                "chat_id": self.chat_id,
-                "text": text,
-                "parse_mode": parse_mode,
-                "disable_web_page_preview": True
-            }
+            payload = {**self._base_payload, "text": text, "parse_mode": parse_mode}
             
-            response = requests.post(url, json=payload, timeout=10)
+            response = self._session.post(self._send_url, json=payload, timeout=10)
             
             if response.status_code == 200:
                 logger.debug("Telegram message sent successfully")
@@ -84,29 +137,12 @@ class TelegramAlert:
         if not self.enabled:
             return False
         
-        timestamp = event.get("timestamp", "N/A")
-        host = event.get("source_host", "unknown")
-        event_type = event.get("event_type", "UNKNOWN")
-        severity = event.get("severity", 0)
-        user = event.get("user", "system")
-        ip = event.get("source_ip", "N/A")
-        message = event.get("raw_message", "")
+        fields = defaultdict(lambda: "N/A", _CRITICAL_DEFAULTS)
+        fields.update(event)
+        fields["details"] = fields["raw_message"][:200]
+        fields["short_id"] = fields["event_id"][:8]
         
-        alert_text = f"""
-🚨 <b>CRITICAL SECURITY ALERT</b>
-
-<b>Type:</b> {event_type}
-<b>Severity:</b> {severity}/5
-<b>Host:</b> {host}
-<b>User:</b> {user}
-<b>Source IP:</b> {ip}
-<b>Time:</b> {timestamp}
-
-<b>Details:</b>
-<code>{message[:200]}</code>
-
-ID: {event.get('event_id', 'N/A')[:8]}...
-"""
+        alert_text = _CRITICAL_TMPL.format_map(fields)
         
         return self._send_message(alert_text, "HTML")
     
@@ -171,22 +207,13 @@ Check dashboard for details.
             for ip in top_ips[:3]
         ])
         
-        report_text = f"""
-📊 <b>Mini-SIEM Daily Report</b>
-
-<b>24-Hour Summary:</b>
-  Total Alerts: {total_alerts}
-
-<b>Threats by OS:</b>
-{os_summary or "  No threats detected"}
-
-<b>Top Attacking IPs:</b>
-{ips_summary or "  No attacks detected"}
-
-<b>Most Blocked Domain:</b> {metrics.get('most_blocked_domain', 'N/A')}
-
-Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-"""
+        report_text = _METRICS_TMPL.format(
+            total_alerts=total_alerts,
+            os_summary=os_summary or "  No threats detected",
+            ips_summary=ips_summary or "  No attacks detected",
+            most_blocked_domain=metrics.get("most_blocked_domain", "N/A"),
+            time=datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        )
         
         return self._send_message(report_text, "HTML")
     
@@ -240,13 +267,13 @@ Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
         
         status_indicator = "✅" if status == "online" else "⚠️" if status == "error" else "❌"
         
-        msg_text = f"""
-{status_indicator} <b>Agent Status: {agent_name}</b>
-
-<b>Status:</b> {status}
-{f"<b>Last Seen:</b> {last_seen}" if last_seen else ""}
-<b>Updated:</b> {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-"""
+        msg_text = _AGENT_STATUS_TMPL.format(
+            indicator=status_indicator,
+            agent_name=agent_name,
+            status=status,
+            last_seen_line=f"<b>Last Seen:</b> {last_seen}" if last_seen else "",
+            time=datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        )
         
         return self._send_message(msg_text, "HTML")
     
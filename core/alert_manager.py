@@ -17,10 +17,10 @@ from datetime import datetime, timedelta
 
 try:
     from .database_pg import (
-        check_alert_sent, record_alert_sent, get_all_events,
-        get_host_status, get_config
+        check_alert_sent, record_alerts_sent, get_unalerted_events,
+        get_host_status, get_configs
     )
-    from .telegram_alerts import send_critical_event_alert, send_host_down_alert
+    from .telegram_alerts import send_critical_batch_alert, send_critical_event_alert, send_host_down_alert
 except ImportError:
     print("Error: Required modules not available")
     exit(1)
@@ -28,6 +28,12 @@ except ImportError:
 # Default check interval (can remain static as it controls the loop sleep)
 ALERT_CHECK_INTERVAL_SECONDS = int(os.getenv("ALERT_CHECK_INTERVAL", "60"))
 
+# Consecutive failed single-event sends after which Telegram is treated as unreachable for this cycle
+MAX_CONSECUTIVE_SEND_FAILURES = 3
+
+# How long dynamic config read from the database is reused before re-fetching
+CONFIG_CACHE_TTL_SECONDS = 30
+
 class AlertManager:
     """Background service for managing security alerts."""
 
@@ -35,47 +41,73 @@ class AlertManager:
         self.running = False
         self.last_event_check_time = None
         self.thread = None
+        self._cfg_cache = {}
+        self._cfg_ts = 0.0
+
+    def _cached_config(self) -> dict:
+        """Return dynamic config, re-reading all keys from the DB at most every CONFIG_CACHE_TTL_SECONDS."""
+        now = time.time()
+        if now - self._cfg_ts > CONFIG_CACHE_TTL_SECONDS:
+            values = get_configs([
+                "ALERT_SEVERITY_THRESHOLD", "ALERT_INACTIVE_THRESHOLD",
+                "ENABLE_TELEGRAM_ALERTS", "ALERT_QUIET_HOURS",
+            ])
+            quiet_hours = values.get("ALERT_QUIET_HOURS", os.getenv("ALERT_QUIET_HOURS", ""))
+            self._cfg_cache = {
+                "severity_threshold": int(values.get("ALERT_SEVERITY_THRESHOLD", os.getenv("ALERT_SEVERITY_THRESHOLD", "4"))),
+                "inactive_threshold": int(values.get("ALERT_INACTIVE_THRESHOLD", os.getenv("ALERT_INACTIVE_THRESHOLD", "15"))),
+                "alerts_enabled": str(values.get("ENABLE_TELEGRAM_ALERTS", os.getenv("ENABLE_TELEGRAM_ALERTS", "true"))).lower() == "true",
+                "quiet_hours": quiet_hours,
+                "quiet_window": self._parse_quiet_hours(quiet_hours),
+            }
+            self._cfg_ts = now
+        return self._cfg_cache
 
     # Helpers to get dynamic config from DB
     def get_severity_threshold(self) -> int:
-        return int(get_config("ALERT_SEVERITY_THRESHOLD", os.getenv("ALERT_SEVERITY_THRESHOLD", "4")))
+        return self._cached_config()["severity_threshold"]
 
     def get_inactive_threshold(self) -> int:
-        return int(get_config("ALERT_INACTIVE_THRESHOLD", os.getenv("ALERT_INACTIVE_THRESHOLD", "15")))
+        return self._cached_config()["inactive_threshold"]
 
     def get_alerts_enabled(self) -> bool:
-        val = get_config("ENABLE_TELEGRAM_ALERTS", os.getenv("ENABLE_TELEGRAM_ALERTS", "true"))
-        return str(val).lower() == "true"
+        return self._cached_config()["alerts_enabled"]
 
     def get_quiet_hours(self) -> str:
-        return get_config("ALERT_QUIET_HOURS", os.getenv("ALERT_QUIET_HOURS", ""))
+        return self._cached_config()["quiet_hours"]
 
-    def is_quiet_hour(self) -> bool:
-        """Check if current time falls within quiet hours."""
-        quiet_hours = self.get_quiet_hours()
+    @staticmethod
+    def _parse_quiet_hours(quiet_hours: str):
+        """Parse "HH:MM-HH:MM" into (start_minutes, end_minutes, wraps_midnight), or None."""
         if not quiet_hours or "-" not in quiet_hours:
-            return False
+            return None
 
         try:
             start_str, end_str = quiet_hours.split("-")
             start_hour, start_min = map(int, start_str.split(":"))
             end_hour, end_min = map(int, end_str.split(":"))
-
-            now = datetime.now()
-            current_minutes = now.hour * 60 + now.minute
-            start_minutes = start_hour * 60 + start_min
-            end_minutes = end_hour * 60 + end_min
-
-            if start_minutes < end_minutes:
-                # Normal case: 22:00-06:00 doesn't wrap midnight
-                return start_minutes <= current_minutes < end_minutes
-            else:
-                # Wraps midnight: 22:00-06:00
-                return current_minutes >= start_minutes or current_minutes < end_minutes
         except Exception as e:
             print(f"Error parsing quiet hours: {e}")
+            return None
+
+        start_minutes = start_hour * 60 + start_min
+        end_minutes = end_hour * 60 + end_min
+        # e.g. 22:00-06:00 wraps midnight; 01:00-05:00 does not
+        return (start_minutes, end_minutes, start_minutes >= end_minutes)
+
+    def is_quiet_hour(self) -> bool:
+        """Check if current time falls within quiet hours."""
+        window = self._cached_config()["quiet_window"]
+        if not window:
             return False
 
+        now = datetime.now()
+        current_minutes = now.hour * 60 + now.minute
+        start_minutes, end_minutes, wraps = window
+        if wraps:
+            return current_minutes >= start_minutes or current_minutes < end_minutes
+        return start_minutes <= current_minutes < end_minutes
+
     def check_critical_events(self):
         """Check for and alert on critical events."""
         if not self.get_alerts_enabled():
@@ -83,32 +115,67 @@ class AlertManager:
 
         try:
             threshold = self.get_severity_threshold()
-            # Get recent events (last 10 minutes)
-            events = get_all_events(limit=100)
-
-            for event in events:
-                severity = event.get("severity", 0)
-
-                # Check if meets critical threshold and hasn't been alerted
-                if severity >= threshold:
-                    event_id = event.get("event_id", "")
-
-                    if event_id and not check_alert_sent(event_id, "critical"):
-                        # Skip if in quiet hours
-                        if self.is_quiet_hour():
-                            print(f"[QUIET HOURS] Suppressing alert for event {event_id}")
-                            continue
-
-                        # Send alert
-                        if send_critical_event_alert(event):
-                            print(f"[✓] Alert sent for critical event: {event_id}")
-                            record_alert_sent(event_id, "critical")
-                        else:
-                            print(f"[✗] Failed to send alert for event: {event_id}")
+            # Unalerted critical events ingested since the last check (first run: last 10 minutes),
+            # sent together as one message
+            pending = get_unalerted_events(threshold, since=self.last_event_check_time, limit=100)
+
+            if not pending:
+                return
+
+            # Defer during quiet hours: the watermark does not move past these events, so they
+            # are picked up again and alerted once quiet hours end. On the first cycle it is pinned
+            # to the oldest one, so they don't age out of the initial 10-minute lookback meanwhile.
+            if self.is_quiet_hour():
+                if self.last_event_check_time is None:
+                    self.last_event_check_time = pending[0]["created_at"]
+                print(f"[QUIET HOURS] Deferring alerts for {len(pending)} critical event(s)")
+                return
+
+            if send_critical_batch_alert(pending):
+                delivered = pending
+            else:
+                delivered = self._send_individually(pending)
+
+            delivered_ids = {event["event_id"] for event in delivered}
+            unsent = [event for event in pending if event["event_id"] not in delivered_ids]
+            for event in pending:
+                event_id = event["event_id"]
+                if event_id in delivered_ids:
+                    print(f"[✓] Alert sent for critical event: {event_id}")
+                else:
+                    print(f"[✗] Failed to send alert for event: {event_id}")
+            record_alerts_sent([(event_id, "critical") for event_id in delivered_ids])
+
+            # Keep the watermark at the oldest unsent event so it is retried next cycle;
+            # the alert_history anti-join skips everything already delivered
+            if unsent:
+                self.last_event_check_time = unsent[0]["created_at"]
+            else:
+                self.last_event_check_time = pending[-1]["created_at"]
 
         except Exception as e:
             print(f"Error checking critical events: {e}")
 
+    def _send_individually(self, events: list) -> list:
+        """
+        Send events one message each after a batched send failed, so one event Telegram
+        rejects cannot hold back the rest. Returns the events that were delivered.
+        """
+        if len(events) == 1:
+            return []
+
+        delivered = []
+        failures = 0
+        for event in events:
+            if send_critical_event_alert(event, dedupe=False):
+                delivered.append(event)
+                failures = 0
+            else:
+                failures += 1
+                if failures >= MAX_CONSECUTIVE_SEND_FAILURES:
+                    break
+        return delivered
+
     def check_inactive_hosts(self):
         """Check for and alert on inactive hosts."""
         if not self.get_alerts_enabled():
@@ -118,6 +185,7 @@ class AlertManager:
             threshold_mins = self.get_inactive_threshold()
             host_status = get_host_status(inactive_threshold_minutes=threshold_mins)
 
+            sent_ids = []
             for host in host_status.get("inactive", []):
                 hostname = host.get("hostname", "")
                 event_id = f"host-down-{hostname}"
@@ -129,11 +197,12 @@ class AlertManager:
                         continue
 
                     # Send alert
-                    if send_host_down_alert(hostname, host.get("os_type", "UNKNOWN"), host.get("last_seen", "")):
+                    if send_host_down_alert(hostname, host.get("os_type", "UNKNOWN"), host.get("last_seen", ""), dedupe=False):
                         print(f"[✓] Alert sent for inactive host: {hostname}")
-                        record_alert_sent(event_id, "host_down")
+                        sent_ids.append((event_id, "host_down"))
                     else:
                         print(f"[✗] Failed to send host-down alert for: {hostname}")
+            record_alerts_sent(sent_ids)
 
         except Exception as e:
             print(f"Error checking inactive hosts: {e}")
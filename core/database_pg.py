@@ -121,6 +121,9 @@ def init_database():
         cursor.execute("""
             CREATE INDEX IF NOT EXISTS idx_timestamp_ostype ON logs(timestamp DESC, os_type)
         """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_created_at ON logs(created_at)
+        """)
 
         # Create heartbeat table for agent status tracking
         cursor.execute("""
@@ -567,6 +570,35 @@ def get_host_status(inactive_threshold_minutes: int = 15) -> dict:
         return_conn(conn)
         return {"active": [], "inactive": [], "threshold_minutes": inactive_threshold_minutes}
 
+def get_unalerted_events(min_severity: int, since: datetime = None, limit: int = 100) -> list[dict]:
+    """
+    Get events at or above min_severity that have no critical alert recorded,
+    oldest first by ingest time. Without `since`, only the last 10 minutes are considered.
+    """
+    try:
+        conn = get_conn()
+        cursor = conn.cursor(cursor_factory=extras.DictCursor)
+
+        cursor.execute("""
+            SELECT l.* FROM logs l
+            LEFT JOIN alert_history a
+                ON a.event_id = l.event_id AND a.alert_type = 'critical'
+            WHERE l.severity >= %s
+              AND l.created_at >= COALESCE(%s, CURRENT_TIMESTAMP - INTERVAL '10 minutes')
+              AND a.event_id IS NULL
+            ORDER BY l.created_at
+            LIMIT %s
+        """, (min_severity, since, limit))
+
+        rows = cursor.fetchall()
+        return_conn(conn)
+
+        return [dict(row) for row in rows]
+    except Exception as e:
+        print(f"Error retrieving unalerted events: {e}")
+        return_conn(conn)
+        return []
+
 def check_alert_sent(event_id: str, alert_type: str = "critical") -> bool:
     """Check if an alert has already been sent for this event."""
     try:
@@ -608,6 +640,29 @@ def record_alert_sent(event_id: str, alert_type: str = "critical") -> bool:
         return_conn(conn)
         return False
 
+def record_alerts_sent(pairs: list[tuple[str, str]]) -> bool:
+    """Record several sent alerts as (event_id, alert_type) pairs in one transaction."""
+    if not pairs:
+        return True
+    try:
+        conn = get_conn()
+        cursor = conn.cursor()
+
+        extras.execute_values(cursor, """
+            INSERT INTO alert_history (event_id, alert_type)
+            VALUES %s
+            ON CONFLICT (event_id, alert_type) DO NOTHING
+        """, pairs)
+
+        conn.commit()
+        return_conn(conn)
+        return True
+    except Exception as e:
+        print(f"Error recording alert history: {e}")
+        conn.rollback()
+        return_conn(conn)
+        return False
+
 def delete_host_events(source_host: str) -> bool:
     """Delete all events from a specific host."""
     try:
@@ -650,6 +705,23 @@ def get_config(key: str, default: str = None) -> str:
             return_conn(conn)
         return default
 
+def get_configs(keys: list[str]) -> dict:
+    """Get several configuration values from the database in one query."""
+    try:
+        conn = get_conn()
+        cursor = conn.cursor()
+        
+        cursor.execute("SELECT key, value FROM config WHERE key = ANY(%s)", (list(keys),))
+        result = dict(cursor.fetchall())
+        
+        return_conn(conn)
+        return result
+    except Exception as e:
+        print(f"Error getting config {keys}: {e}")
+        if conn:
+            return_conn(conn)
+        return {}
+
 def set_config(key: str, value: str) -> bool:
     """Set a configuration value in the database."""
     try:
@@ -725,6 +797,38 @@ def upsert_system_status(status: dict) -> bool:
             return_conn(conn)
         return False
 
+def update_system_status_metrics(delta: dict) -> bool:
+    """
+    Update the fast-changing metrics of an existing system status row.
+    Returns False when the host has no full snapshot stored yet.
+    """
+    try:
+        conn = get_conn()
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            UPDATE system_status SET
+                cpu_usage = %s,
+                memory_used = %s,
+                memory_percent = %s,
+                last_updated = CURRENT_TIMESTAMP
+            WHERE source_host = %s
+        """, (
+            delta["cpu_usage"], delta["memory_used"], delta["memory_percent"],
+            delta["source_host"]
+        ))
+        updated = cursor.rowcount > 0
+        
+        conn.commit()
+        return_conn(conn)
+        return updated
+    except Exception as e:
+        print(f"Error updating system status metrics: {e}")
+        if conn:
+            conn.rollback()
+            return_conn(conn)
+        return False
+
 def get_system_status(source_host: str) -> dict:
     """Get the latest system status for a host."""
     try:
@@ -5,11 +5,15 @@ Defines the core event schema used across all Heimdall agents and the API.
 All security events are normalized into this structure for consistent correlation.
 """
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 from typing import Literal, Optional
 from datetime import datetime
 import uuid
 
+# Largest batch a soa_v1 payload may declare. Agents split larger backlogs into several
+# requests (the macOS agent posts at most its MAX_SEND_EVENTS, 5000, per request).
+MAX_SOA_EVENTS = 10000
+
 
 class LogEvent(BaseModel):
     """
@@ -63,9 +67,65 @@ class LogEvent(BaseModel):
 
 
 class IngestRequest(BaseModel):
-    """Request body for the /ingest endpoint."""
+    """
+    Request body for the /ingest endpoint.
+    
+    Agents may also send events column-wise with "schema": "soa_v1" and "n" events.
+    Each LogEvent field is a list of n values, a single value shared by all events,
+    or a dictionary-encoded column {"values": [distinct values], "codes": [n indexes]}.
+    "n" is capped at MAX_SOA_EVENTS, and batches of more than one event need at least one list column.
+    """
     events: list[LogEvent] = Field(..., description="List of log events to ingest")
     api_key: Optional[str] = Field(None, description="API key for authentication")
+    
+    @model_validator(mode="before")
+    @classmethod
+    def expand_columns(cls, data):
+        """Turn a soa_v1 columnar payload into the row-wise events list."""
+        if not isinstance(data, dict) or data.get("schema") != "soa_v1":
+            return data
+        
+        n = data.get("n")
+        if not isinstance(n, int) or n < 0:
+            raise ValueError("soa_v1 payload needs a non-negative integer 'n'")
+        if n > MAX_SOA_EVENTS:
+            raise ValueError(f"soa_v1 payload declares {n} events, at most {MAX_SOA_EVENTS} are accepted")
+        
+        columns = {}
+        shared = {}
+        for field in LogEvent.model_fields:
+            if field not in data:
+                continue
+            value = data[field]
+            if isinstance(value, dict):
+                value = cls._decode_column(field, value)
+            if isinstance(value, list):
+                if len(value) != n:
+                    raise ValueError(f"soa_v1 column '{field}' has {len(value)} values, expected {n}")
+                columns[field] = value
+            else:
+                shared[field] = value
+        
+        # Scalars alone would let a tiny body expand into n events, so batches need a real column
+        if n > 1 and not columns:
+            raise ValueError("soa_v1 payload with more than one event needs at least one list column")
+        
+        events = [dict(shared) for _ in range(n)]
+        for field, values in columns.items():
+            for event, value in zip(events, values):
+                event[field] = value
+        return {"events": events, "api_key": data.get("api_key")}
+    
+    @staticmethod
+    def _decode_column(field: str, column: dict) -> list:
+        """Expand a dictionary-encoded soa_v1 column into its list of values."""
+        values = column.get("values")
+        codes = column.get("codes")
+        if not isinstance(values, list) or not isinstance(codes, list):
+            raise ValueError(f"soa_v1 column '{field}' needs 'values' and 'codes' lists")
+        if not all(isinstance(code, int) and 0 <= code < len(values) for code in codes):
+            raise ValueError(f"soa_v1 column '{field}' has a code outside its values")
+        return [values[code] for code in codes]
 
 
 class IngestResponse(BaseModel):
@@ -115,3 +175,22 @@ class SystemStatusRequest(BaseModel):
     status: SystemStatus
     api_key: Optional[str] = Field(None, description="API key")
 
+
+class SystemStatusDelta(BaseModel):
+    """
+    Fast-changing part of a system status snapshot.
+    Agents send this between full snapshots while the stable fields are unchanged.
+    """
+    source_host: str = Field(..., description="Hostname")
+    os_type: str = Field(..., description="OS Type")
+    cpu_usage: float = Field(..., description="Total CPU usage percent")
+    memory_used: int = Field(..., description="Used RAM in bytes")
+    memory_percent: float = Field(..., description="RAM usage percent")
+    timestamp: str = Field(..., description="ISO timestamp of this snapshot")
+
+
+class SystemStatusDeltaRequest(BaseModel):
+    """Request body for status delta ingestion."""
+    status_delta: SystemStatusDelta
+    api_key: Optional[str] = Field(None, description="API key")
+
@@ -7,11 +7,14 @@ Handles event ingestion from all agents, validation, storage, and analytics quer
 Heimdall stands guard with a comprehensive REST API for security intelligence.
 """
 
-from fastapi import FastAPI, HTTPException, Header, status, Request
+from fastapi import FastAPI, HTTPException, Header, status, Request, Response
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.routing import APIRoute, APIRouter
 from contextlib import asynccontextmanager
+from typing import Callable
 import os
+import zlib
 from datetime import datetime, timedelta
 
 # Try to load .env file if it exists
@@ -22,12 +25,14 @@ except ImportError:
     # python-dotenv not installed, proceed without it
     pass
 
-from .models import LogEvent, IngestRequest, IngestResponse, MetricsResponse, SystemStatusRequest
+from .models import (
+    LogEvent, IngestRequest, IngestResponse, MetricsResponse, SystemStatusRequest, SystemStatusDeltaRequest
+)
 from .database_pg import (
     init_database, insert_event, insert_events_batch, get_all_events, get_events_by_filter,
     get_metrics_24h, get_top_attacking_ips, get_events_per_minute, get_host_status,
     record_heartbeat, delete_host_events, get_config, set_config,
-    upsert_system_status, get_system_status
+    upsert_system_status, update_system_status_metrics, get_system_status
 )
 from .alert_manager import start_alert_manager
 
@@ -35,6 +40,8 @@ from .alert_manager import start_alert_manager
 API_KEY = os.getenv("SIEM_API_KEY", "default-insecure-key-change-me")
 DATABASE_PATH = os.getenv("SIEM_DATABASE_PATH", "mini_siem.db")
 VALID_API_KEYS = {API_KEY}
+# Largest request body accepted after gzip decompression, so a small compressed body cannot exhaust memory
+MAX_DECOMPRESSED_BODY_BYTES = int(os.getenv("SIEM_MAX_DECOMPRESSED_BODY_BYTES", str(32 * 1024 * 1024)))
 
 
 @asynccontextmanager
@@ -45,6 +52,54 @@ async def lifespan(app: FastAPI):
     yield
 
 
+class GzipRequest(Request):
+    """Request that transparently decompresses gzip-encoded bodies sent by agents."""
+
+    async def body(self) -> bytes:
+        if not hasattr(self, "_body"):
+            body = await super().body()
+            if "gzip" in self.headers.getlist("Content-Encoding"):
+                body = self._gunzip(body)
+            self._body = body
+        return self._body
+
+    @staticmethod
+    def _gunzip(body: bytes) -> bytes:
+        """Decompress a gzip body, stopping once it exceeds MAX_DECOMPRESSED_BODY_BYTES."""
+        decompressor = zlib.decompressobj(wbits=31)
+        try:
+            data = decompressor.decompress(body, MAX_DECOMPRESSED_BODY_BYTES + 1)
+        except zlib.error:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Malformed gzip body"
+            )
+        if len(data) > MAX_DECOMPRESSED_BODY_BYTES:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail="Decompressed body too large"
+            )
+        if not decompressor.eof:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Truncated gzip body"
+            )
+        return data
+
+
+class GzipRoute(APIRoute):
+    """Route class that hands endpoints a GzipRequest."""
+
+    def get_route_handler(self) -> Callable:
+        original_route_handler = super().get_route_handler()
+
+        async def custom_route_handler(request: Request) -> Response:
+            request = GzipRequest(request.scope, request.receive)
+            return await original_route_handler(request)
+
+        return custom_route_handler
+
+
 app = FastAPI(
     title="Heimdall API",
     description="Heimdall - Standing Guard Over Your Infrastructure. Central event ingestion and security intelligence API.",
@@ -86,7 +141,11 @@ async def root():
     }
 
 
-@app.post("/ingest", response_model=IngestResponse, tags=["Ingestion"])
+# Agent ingest routes accept gzip-compressed request bodies
+ingest_router = APIRouter(route_class=GzipRoute)
+
+
+@ingest_router.post("/ingest", response_model=IngestResponse, tags=["Ingestion"])
 async def ingest_logs(request: IngestRequest, api_key: str = Header(None)):
     """
     Ingest log events from agents.
@@ -132,6 +191,9 @@ async def ingest_logs(request: IngestRequest, api_key: str = Header(None)):
         )
 
 
+app.include_router(ingest_router)
+
+
 @app.get("/events", tags=["Query"])
 async def get_events(
     os_type: str = None,
@@ -612,6 +674,31 @@ async def ingest_system_status(request: SystemStatusRequest, api_key: str = Head
             content={"success": False, "message": f"Error: {str(e)}"}
         )
 
+@app.post("/system-status/delta", tags=["Monitoring"])
+async def ingest_system_status_delta(request: SystemStatusDeltaRequest, api_key: str = Header(None)):
+    """
+    Ingest the fast-changing metrics of a system status snapshot.
+    Returns 404 when the host has no full snapshot yet, so the agent sends one.
+    """
+    validate_api_key(api_key)
+    
+    try:
+        # Also update heartbeat since the agent is alive
+        record_heartbeat(request.status_delta.source_host, request.status_delta.os_type)
+        
+        if update_system_status_metrics(request.status_delta.model_dump()):
+            return {"success": True, "message": "System status updated"}
+        else:
+            return JSONResponse(
+                status_code=404,
+                content={"success": False, "message": "No full system status stored for host"}
+            )
+    except Exception as e:
+        return JSONResponse(
+            status_code=500,
+            content={"success": False, "message": f"Error: {str(e)}"}
+        )
+
 @app.get("/system-status/{hostname}", tags=["Monitoring"])
 async def retrieve_system_status(hostname: str, api_key: str = Header(None)):
     """Get detailed system status for a specific host."""
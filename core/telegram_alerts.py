@@ -5,8 +5,10 @@ Sends security alerts to Telegram channel for real-time notifications.
 """
 
 import requests
+from requests.adapters import HTTPAdapter
 import os
 from datetime import datetime
+from html import escape
 
 # Try to import database functions for alert deduplication
 try:
@@ -21,6 +23,38 @@ TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID", "")
 
 TELEGRAM_API_URL = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
 
+# Pooled keep-alive session, so alerts after the first skip the TCP and TLS handshakes
+_session = requests.Session()
+_session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=10))
+
+# Most events listed individually in one batched critical alert
+MAX_BATCH_LINES = 10
+
+
+def _post_message(message: str) -> bool:
+    """
+    Post an HTML message to the configured Telegram chat.
+    Event fields come from monitored hosts, so callers escape them with _esc.
+    """
+    payload = {
+        "chat_id": TELEGRAM_CHAT_ID,
+        "text": message,
+        "parse_mode": "HTML",
+    }
+
+    response = _session.post(TELEGRAM_API_URL, json=payload, timeout=10)
+
+    if response.status_code == 200:
+        return True
+    else:
+        print(f"Telegram API error: {response.status_code} - {response.text}")
+        return False
+
+
+def _esc(value) -> str:
+    """Escape a value for Telegram HTML, so a stray <, > or & in a log field cannot break the message."""
+    return escape(str(value), quote=False)
+
 
 def send_alert(title: str, details: dict, severity: int = 3) -> bool:
     """
@@ -49,21 +83,22 @@ def send_alert(title: str, details: dict, severity: int = 3) -> bool:
         }.get(severity, "⚠️")
 
         # Build message
-        message = f"{severity_emoji} *{title}*\n\n"
+        message = f"{severity_emoji} <b>{_esc(title)}</b>\n\n"
 
         # Add event details
         for key, value in details.items():
             if key in ["source_host", "os_type", "event_type", "source_ip", "user"]:
+                value = _esc(value)
                 if key == "event_type":
-                    message += f"📋 *Type*: `{value}`\n"
+                    message += f"📋 <b>Type</b>: <code>{value}</code>\n"
                 elif key == "source_host":
-                    message += f"🖥️ *Host*: `{value}`\n"
+                    message += f"🖥️ <b>Host</b>: <code>{value}</code>\n"
                 elif key == "os_type":
-                    message += f"🐧 *OS*: `{value}`\n"
+                    message += f"🐧 <b>OS</b>: <code>{value}</code>\n"
                 elif key == "source_ip":
-                    message += f"🌐 *Source IP*: `{value}`\n"
+                    message += f"🌐 <b>Source IP</b>: <code>{value}</code>\n"
                 elif key == "user":
-                    message += f"👤 *User*: `{value}`\n"
+                    message += f"👤 <b>User</b>: <code>{value}</code>\n"
 
         # Add raw message if available
         if "raw_message" in details:
@@ -71,38 +106,29 @@ def send_alert(title: str, details: dict, severity: int = 3) -> bool:
             # Truncate if too long
             if len(raw) > 200:
                 raw = raw[:197] + "..."
-            message += f"\n📝 *Details*: ```\n{raw}\n```"
+            message += f"\n📝 <b>Details</b>: <pre>{_esc(raw)}</pre>"
 
         # Add timestamp
-        message += f"\n⏰ *Time*: {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S UTC')}"
+        message += f"\n⏰ <b>Time</b>: {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S UTC')}"
 
         # Send to Telegram
-        payload = {
-            "chat_id": TELEGRAM_CHAT_ID,
-            "text": message,
-            "parse_mode": "Markdown",
-        }
-
-        response = requests.post(TELEGRAM_API_URL, json=payload, timeout=10)
-
-        if response.status_code == 200:
-            return True
-        else:
-            print(f"Telegram API error: {response.status_code} - {response.text}")
-            return False
+        return _post_message(message)
 
     except Exception as e:
         print(f"Error sending Telegram alert: {e}")
         return False
 
 
-def send_host_down_alert(hostname: str, os_type: str, last_seen: str) -> bool:
-    """Send alert when host goes inactive."""
+def send_host_down_alert(hostname: str, os_type: str, last_seen: str, dedupe: bool = True) -> bool:
+    """
+    Send alert when host goes inactive.
+    Pass dedupe=False when the caller already tracks alert history itself.
+    """
     # Use hostname as event_id for deduplication
     event_id = f"host-down-{hostname}"
 
     # Check if already sent to prevent duplicates
-    if HAS_DB and check_alert_sent(event_id, "host_down"):
+    if dedupe and HAS_DB and check_alert_sent(event_id, "host_down"):
         return False
 
     details = {
@@ -114,30 +140,67 @@ def send_host_down_alert(hostname: str, os_type: str, last_seen: str) -> bool:
     result = send_alert(f"🚨 Host Offline: {hostname}", details, severity=4)
 
     # Record alert if successfully sent
-    if result and HAS_DB:
+    if dedupe and result and HAS_DB:
         record_alert_sent(event_id, "host_down")
 
     return result
 
 
-def send_critical_event_alert(event: dict) -> bool:
-    """Send alert for critical security events."""
+def send_critical_event_alert(event: dict, dedupe: bool = True) -> bool:
+    """
+    Send alert for critical security events.
+    Pass dedupe=False when the caller already tracks alert history itself.
+    """
     event_id = event.get("event_id", "")
 
     # Check if already sent to prevent duplicates
-    if HAS_DB and event_id and check_alert_sent(event_id, "critical"):
+    if dedupe and HAS_DB and event_id and check_alert_sent(event_id, "critical"):
         return False
 
     title = f"🔴 {event.get('event_type', 'CRITICAL_EVENT')}"
     result = send_alert(title, event, severity=event.get("severity", 4))
 
     # Record alert if successfully sent
-    if result and HAS_DB and event_id:
+    if dedupe and result and HAS_DB and event_id:
         record_alert_sent(event_id, "critical")
 
     return result
 
 
+def send_critical_batch_alert(events: list) -> bool:
+    """
+    Send one alert summarizing several critical security events.
+    The caller handles deduplication and records each event as alerted.
+    """
+    # A lone event keeps the detailed single-event message
+    if len(events) == 1:
+        return send_critical_event_alert(events[0], dedupe=False)
+
+    if not TELEGRAM_BOT_TOKEN or not TELEGRAM_CHAT_ID:
+        print("Telegram not configured - skipping alert")
+        return False
+
+    try:
+        message = f"🚨 <b>{len(events)} Critical Events</b>\n\n"
+        for event in events[:MAX_BATCH_LINES]:
+            message += (
+                f"📋 <code>{_esc(event.get('event_type', 'UNKNOWN'))}</code>"
+                f" on <code>{_esc(event.get('source_host', 'unknown'))}</code>"
+                f" from <code>{_esc(event.get('source_ip', 'N/A'))}</code>"
+                f" (👤 <code>{_esc(event.get('user', 'N/A'))}</code>)\n"
+            )
+        if len(events) > MAX_BATCH_LINES:
+            message += f"...and {len(events) - MAX_BATCH_LINES} more\n"
+
+        message += f"\n⏰ <b>Time</b>: {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S UTC')}"
+
+        return _post_message(message)
+
+    except Exception as e:
+        print(f"Error sending Telegram alert: {e}")
+        return False
+
+
 def send_attack_pattern_alert(attacker_ip: str, attempt_count: int) -> bool:
     """Send alert for repeated attack patterns."""
     details = {
@@ -205,6 +205,49 @@ def submit_events(events: list) -> bool:
         return False
 
 
+def submit_invalid_soa_payloads() -> bool:
+    """Check that oversized and inconsistent soa_v1 payloads are rejected."""
+    headers = {"api-key": API_KEY}
+    shared = {
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "source_host": "dns-server",
+        "os_type": "PIHOLE",
+        "event_type": "DNS_BLOCK",
+        "severity": 1,
+        "source_ip": "192.168.1.20",
+        "user": "pihole",
+        "raw_message": "Blocked DNS query for ads.example.com",
+    }
+    payloads = {
+        "oversized n": {"schema": "soa_v1", "n": 100000000, **shared},
+        "scalar-only batch": {"schema": "soa_v1", "n": 5, **shared},
+        "column length mismatch": {"schema": "soa_v1", "n": 3, **shared,
+                                   "event_id": ["soa-test-1", "soa-test-2"]},
+        "code outside values": {"schema": "soa_v1", "n": 2, **shared,
+                                "event_id": ["soa-test-1", "soa-test-2"],
+                                "user": {"values": ["pihole"], "codes": [0, 1]}},
+    }
+    
+    print(f"\n🧪 Submitting invalid soa_v1 payloads to {API_URL}/ingest")
+    
+    all_rejected = True
+    for name, payload in payloads.items():
+        try:
+            response = requests.post(f"{API_URL}/ingest", json=payload, headers=headers, timeout=10)
+        except Exception as e:
+            print(f"❌ {name}: {str(e)}")
+            all_rejected = False
+            continue
+        
+        if 400 <= response.status_code < 500:
+            print(f"✅ {name}: rejected with {response.status_code}")
+        else:
+            print(f"❌ {name}: expected a 4xx, got {response.status_code}")
+            all_rejected = False
+    
+    return all_rejected
+
+
 def query_events() -> bool:
     """Query and display recent events."""
     try:
@@ -353,6 +396,7 @@ def main():
     
     all_events = linux_events + windows_events + pihole_events + macos_events + firewall_events
     submit_events(all_events)
+    submit_invalid_soa_payloads()
     
     # Query events
     print("\n" + "=" * 100)